@@ -0,0 +1,121 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+# Минимальное число торгующих строк на один поток
+MIN_ROWS_PER_WORKER = 256
+
+
+def _Bids(benefit, prices, rows, eps):
+    # Лучший объект каждой строки и ставка: цена + (лучшая - вторая выгода) + eps
+    values = benefit[rows] - prices
+    best = np.argmax(values, axis=1)
+    index = np.arange(len(rows))
+    best_value = values[index, best]
+    values[index, best] = -np.inf
+    second_value = values.max(axis=1)
+    return best, prices[best] + (best_value - second_value) + eps
+
+
+def _Phase(benefit, prices, eps, assigned, executor, workers):
+    # Аукцион Якоби: все свободные строки делают ставки одновременно,
+    # каждый объект достается наибольшей ставке.
+    # Пары прошлой фазы, удовлетворяющие eps-дополняющей нежесткости, сохраняются
+    size = benefit.shape[0]
+    if assigned is None:
+        assigned = np.full(size, -1)
+    else:
+        values = benefit - prices
+        kept = values[np.arange(size), assigned] >= values.max(axis=1) - eps
+        assigned = np.where(kept, assigned, -1)
+    owner = np.full(size, -1)
+    owner[assigned[assigned >= 0]] = np.flatnonzero(assigned >= 0)
+    unassigned = np.flatnonzero(assigned == -1)
+
+    while len(unassigned):
+        if executor is not None and len(unassigned) >= 2 * MIN_ROWS_PER_WORKER:
+            chunks = np.array_split(unassigned, min(workers, len(unassigned) // MIN_ROWS_PER_WORKER))
+            parts = list(executor.map(lambda rows: _Bids(benefit, prices, rows, eps), chunks))
+            objects = np.concatenate([part[0] for part in parts])
+            bids = np.concatenate([part[1] for part in parts])
+        else:
+            objects, bids = _Bids(benefit, prices, unassigned, eps)
+
+        # Сортировка по объекту, затем по убыванию ставки: первая ставка в группе выигрывает
+        order = np.lexsort((-bids, objects))
+        objects, bids, bidders = objects[order], bids[order], unassigned[order]
+        first = np.r_[True, objects[1:] != objects[:-1]]
+        objects, bids, bidders = objects[first], bids[first], bidders[first]
+
+        previous = owner[objects]
+        assigned[previous[previous >= 0]] = -1
+        owner[objects] = bidders
+        assigned[bidders] = objects
+        prices[objects] = bids
+
+        unassigned = np.flatnonzero(assigned == -1)
+
+    return assigned
+
+
+def AuctionAssignment(benefit, tolerance=None, workers=1, scaling=8.0):
+    """
+    Назначение максимальной суммарной выгоды аукционным алгоритмом с
+    eps-масштабированием.
+
+    Ставки свободных строк вычисляются векторно; при workers > 1 большие
+    наборы ставок делятся между потоками. Прямоугольная матрица дополняется
+    фиктивными строками или столбцами с нулевой выгодой.
+    Работа прекращается, как только двойственная оценка гарантирует, что
+    найденное назначение отстает от оптимума не более чем на tolerance
+    (по умолчанию - на уровне погрешности вычислений).
+
+    Возвращает (row_ind, col_ind, gap), где gap - гарантированная верхняя
+    граница отставания от оптимума.
+    """
+    benefit = np.asarray(benefit, dtype=float)
+    if benefit.ndim != 2:
+        raise ValueError("benefit must be a 2-D array")
+    if not np.all(np.isfinite(benefit)):
+        raise ValueError("benefit must contain only finite values")
+
+    n_rows, n_cols = benefit.shape
+    size = max(n_rows, n_cols)
+    if size == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int), 0.0
+
+    padded = np.zeros((size, size))
+    padded[:n_rows, :n_cols] = benefit
+
+    if tolerance is None:
+        tolerance = 1e-9 * max(1.0, np.abs(padded).max()) * size
+    if tolerance <= 0:
+        raise ValueError("tolerance must be positive")
+
+    if size == 1:
+        assigned = np.zeros(1, dtype=int)
+        gap = 0.0
+    else:
+        # Итоговое eps с size * eps <= tolerance гарантирует нужную точность
+        eps_final = tolerance / size
+        eps = max((padded.max() - padded.min()) / 2, eps_final)
+        prices = np.zeros(size)
+        assigned = None
+
+        executor = ThreadPoolExecutor(workers) if workers > 1 else None
+        try:
+            while True:
+                assigned = _Phase(padded, prices, eps, assigned, executor, workers)
+                primal = padded[np.arange(size), assigned].sum()
+                dual = prices.sum() + (padded - prices).max(axis=1).sum()
+                gap = max(dual - primal, 0.0)
+                if gap <= tolerance or eps <= eps_final:
+                    break
+                eps = max(eps / scaling, eps_final)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    rows = np.arange(n_rows)
+    cols = assigned[:n_rows]
+    real = cols < n_cols
+    return rows[real], cols[real], gap
@@ -0,0 +1,58 @@
+import numpy as np
+import scipy.optimize
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _SolveChunk(costs, modes, row_ind, col_ind):
+    # Решение части стопки; результаты пишутся в заранее выделенные массивы.
+    # scipy.optimize.linear_sum_assignment отпускает GIL, поэтому части
+    # выполняются в потоках параллельно
+    for b in range(costs.shape[0]):
+        for mode, maximize in enumerate(modes):
+            row_ind[mode, b], col_ind[mode, b] = scipy.optimize.linear_sum_assignment(costs[b], maximize=maximize)
+
+
+def _SolveStack(costs, modes, workers):
+    costs = np.asarray(costs, dtype=float)
+    if costs.ndim != 3:
+        raise ValueError("costs must be a (batch x n x v) array")
+
+    batch, n, m = costs.shape
+    k = min(n, m)
+    row_ind = np.empty((len(modes), batch, k), dtype=np.intp)
+    col_ind = np.empty((len(modes), batch, k), dtype=np.intp)
+
+    if workers > 1 and batch > 1:
+        bounds = np.linspace(0, batch, min(workers, batch) + 1).astype(int)
+        with ThreadPoolExecutor(workers) as executor:
+            tasks = [
+                executor.submit(_SolveChunk, costs[lo:hi], modes, row_ind[:, lo:hi], col_ind[:, lo:hi])
+                for lo, hi in zip(bounds[:-1], bounds[1:])
+            ]
+            for task in tasks:
+                task.result()
+    else:
+        _SolveChunk(costs, modes, row_ind, col_ind)
+
+    return row_ind, col_ind
+
+
+def LinearSumAssignmentBatch(costs, maximize=False, workers=1):
+    """
+    Точное решение задачи о назначениях для стопки матриц (B, n, v).
+
+    Возвращает (row_ind, col_ind) формы (B, min(n, v)), как у
+    scipy.optimize.linear_sum_assignment для каждой матрицы.
+    При workers > 1 стопка делится на части, решаемые в пуле потоков.
+    """
+    row_ind, col_ind = _SolveStack(costs, (maximize,), workers)
+    return row_ind[0], col_ind[0]
+
+
+def MinMaxAssignments(costs, workers=1):
+    """
+    Назначения минимальной и максимальной стоимости для стопки матриц за один проход.
+    Возвращает ((row_ind, col_ind) минимума, (row_ind, col_ind) максимума).
+    """
+    row_ind, col_ind = _SolveStack(costs, (False, True), workers)
+    return (row_ind[0], col_ind[0]), (row_ind[1], col_ind[1])
@@ -1,153 +1,585 @@
 import numpy as np
 import scipy.optimize
+import scipy.sparse
+import scipy.sparse.csgraph
 import accessify
+import Policy
+import AuctionSolver
+import BatchAssignment
+import WarmAssignment
+from FactoredMatrix import FactoredMatrix
+
+# Число шагов указателя по порядку столбца перед маскированным выбором в SweepTransitions
+POINTER_STEPS = 4
+
+class _AvailableRows:
+    """
+    Индекс свободных строк для постолбцового выбора.
+
+    Порядки строк, отсортированные по значению в каждом столбце, строятся один
+    раз и разделяются между копиями; копия хранит только маску вычеркнутых строк.
+    Поиск максимума, минимума или k-го минимума среди свободных строк
+    просматривает лишь первые (число вычеркнутых + k) позиций порядка столбца,
+    поэтому его стоимость не зависит от числа строк n. Select выполняет
+    правило дня Policy; порог ищется двоичным поиском по порядку столбца.
+    Для разреженной матрицы порядки содержат только допустимые (хранимые) строки
+    столбца, и поиск просматривает их целиком.
+    При log=True матрица содержит логарифмы: порядки те же, а найденное
+    значение возвращается в исходной шкале.
+    """
+    def __init__(self, matrix, log=False):
+        self.matrix = matrix
+        self.log = log
+        self.sparse = scipy.sparse.issparse(matrix)
+        self.removed = np.zeros(matrix.shape[0], dtype=bool)
+        self.removed_count = 0
+
+        if not self.sparse:
+            # Устойчивая сортировка: при равенстве значений выигрывает меньший индекс строки,
+            # как у np.argmax / np.argmin
+            self.ascending = np.argsort(matrix, axis=0, kind='stable').T
+            self.descending = np.argsort(-matrix, axis=0, kind='stable').T
+            return
+
+        self.ascending, self.descending = [], []
+        self.ascending_values, self.descending_values = [], []
+        for j in range(matrix.shape[1]):
+            rows = matrix.indices[matrix.indptr[j]:matrix.indptr[j + 1]]
+            vals = matrix.data[matrix.indptr[j]:matrix.indptr[j + 1]]
+            for order, sorted_values, key in ((self.ascending, self.ascending_values, vals),
+                                              (self.descending, self.descending_values, -vals)):
+                idx = np.argsort(key, kind='stable')
+                order.append(rows[idx])
+                sorted_values.append(vals[idx])
+
+    def Copy(self):
+        rows = object.__new__(_AvailableRows)
+        rows.__dict__.update(self.__dict__)
+        rows.removed = self.removed.copy()
+        return rows
+
+    def Remove(self, row):
+        if not self.removed[row]:
+            self.removed[row] = True
+            self.removed_count += 1
+
+    def Max(self, column_id):
+        if self.sparse:
+            return self.SparseKth(self.descending[column_id], self.descending_values[column_id], 1)
+        return self.KthFrom(self.descending[column_id], column_id, 1)
+
+    def KMin(self, column_id, k=1):
+        if self.sparse:
+            return self.SparseKth(self.ascending[column_id], self.ascending_values[column_id], k)
+        return self.KthFrom(self.ascending[column_id], column_id, k)
+
+    def Threshold(self, column_id, threshold):
+        # Наименьшее значение не ниже порога, при его отсутствии - максимум
+        if self.log:
+            threshold = np.log(threshold) if threshold > 0 else -np.inf
+        order = self.ascending[column_id]
+        values = self.ascending_values[column_id] if self.sparse else self.matrix[order, column_id]
+        start = np.searchsorted(values, threshold, side='left')
+        free = np.flatnonzero(~self.removed[order[start:]])
+        if len(free) == 0:
+            return self.Max(column_id)
+        value = values[start + free[0]]
+        return (np.exp(value) if self.log else value), order[start + free[0]]
+
+    def Select(self, column_id, code, param):
+        # Строка дня по правилу Policy (code, param)
+        if code == Policy.RULE_MAX:
+            return self.Max(column_id)
+        if code == Policy.RULE_KMIN:
+            return self.KMin(column_id, int(param))
+        return self.Threshold(column_id, param)
+
+    def KthFrom(self, order, column_id, k):
+        available = order.shape[0] - self.removed_count
+        if available <= 0:
+            return -1, -1
+
+        k = min(k, available)
+        # Среди первых removed_count + k позиций порядка гарантированно есть k свободных строк
+        window = order[:self.removed_count + k]
+        row = window[~self.removed[window]][k - 1]
+        value = self.matrix[row, column_id]
+        return (np.exp(value) if self.log else value), row
+
+    def SparseKth(self, order, values, k):
+        free = np.flatnonzero(~self.removed[order])
+        if len(free) == 0:
+            return -1, -1
+
+        position = free[min(k, len(free)) - 1]
+        return values[position], order[position]
+
 
 class Computing:
+    """
+    Матрица может быть прямоугольной (n партий, v этапов) или разреженной
+    (scipy.sparse): хранимые элементы - допустимые пары партия/этап,
+    отсутствующие элементы - недопустимые.
+    FactoredMatrix хранится как log C: эвристики выбирают строки по
+    логарифмам (порядок тот же) и возвращают значения в исходной шкале,
+    плотная C строится только для венгерского алгоритма.
+    """
     def __init__(self, matrix):
-        self.__params = np.array(matrix)
-    
-    @accessify.private
-    def FindMaxInColumnWithExcludedRows(self, column_id, excluded_rows):
-        col = self.__params[:, column_id]
-        n_rows = col.shape[0]
-        
-        mask = np.ones(n_rows, dtype=bool)
-        if excluded_rows:
-            mask[list(excluded_rows)] = False
-            
-        if not np.any(mask):
-            return -1, -1
+        self.__sparse = scipy.sparse.issparse(matrix)
+        self.__log = isinstance(matrix, FactoredMatrix)
+        if self.__log:
+            if matrix.ndim != 2:
+                raise ValueError("Computing expects a single (n x v) factored matrix")
+            self.__params = matrix.Log()
+        elif self.__sparse:
+            self.__params = scipy.sparse.csc_matrix(matrix, dtype=float)
+            self.__params.sort_indices()
+        else:
+            self.__params = np.array(matrix)
+        self.__rows = None
+        # Последние оптимальные назначения с потенциалами (ключ - maximize)
+        self.__warm = {}
+        # Гарантированное отставание последнего назначения от оптимума
+        self.gap = 0.0
+
+    def __AvailableRows(self):
+        # Порядки строк строятся лениво, при первом вызове эвристики
+        if self.__rows is None:
+            self.__rows = _AvailableRows(self.__params, self.__log)
+        return self.__rows.Copy()
 
-        filtered_col = col[mask]
-        original_indices = np.where(mask)[0]
-        
-        max_idx_local = np.argmax(filtered_col)
-        max_val = filtered_col[max_idx_local]
-        row_idx = original_indices[max_idx_local]
+    def __ExcludeRows(self, excluded_rows):
+        rows = self.__AvailableRows()
+        for row in excluded_rows or ():
+            rows.Remove(row)
+        return rows
 
-        return max_val, row_idx
+    @accessify.private
+    def FindMaxInColumnWithExcludedRows(self, column_id, excluded_rows):
+        return self.__ExcludeRows(excluded_rows).Max(column_id)
 
     @accessify.private
     def FindKMinInColumnWithExcludedRows(self, column_id, excluded_rows, k=1):
-        col = self.__params[:, column_id]
-        n_rows = col.shape[0]
-
-        mask = np.ones(n_rows, dtype=bool)
-        if excluded_rows:
-            mask[list(excluded_rows)] = False
-            
-        if not np.any(mask):
-            return -1, -1
+        return self.__ExcludeRows(excluded_rows).KMin(column_id, k)
+
+    def EvaluatePolicies(self, policies):
+        """
+        Вычисляет набор стратегий Policy на матрице за один проход.
+        Возвращает стоимости (P,) и значения по дням (P, v).
+        """
+        return Policy.EvaluatePolicies(policies, self.__Dense(), log=self.__log)
+
+    def __Values(self):
+        # Матрица в исходной шкале для решателей назначения
+        return np.exp(self.__params, dtype=float) if self.__log else self.__params
+
+    def __Dense(self):
+        # Плотная форма; недопустимые элементы разреженной матрицы - NaN
+        if not self.__sparse:
+            return self.__params
+        coo = self.__params.tocoo()
+        dense = np.full(coo.shape, np.nan)
+        dense[coo.row, coo.col] = coo.data
+        return dense
+
+    def __SparseAssignment(self, maximize):
+        weights = self.__params.copy()
+        # Паросочетание наибольшей мощности содержит одно и то же число ребер,
+        # поэтому сдвиг всех весов на константу не меняет оптимум; веса делаются
+        # положительными, так как нулевые веса считаются отсутствующими ребрами
+        if weights.nnz:
+            if maximize:
+                weights.data = weights.data.max() - weights.data + 1
+            else:
+                weights.data = weights.data - weights.data.min() + 1
+
+        # Каждому дню добавляется фиктивная строка-пропуск с весом больше любого
+        # паросочетания из настоящих ребер: полное паросочетание существует всегда,
+        # пропуски берутся только для дней, которые нельзя покрыть, и отбрасываются
+        n, cols = weights.shape
+        penalty = cols * (weights.data.max() if weights.nnz else 1) + 1
+        skips = scipy.sparse.identity(cols, format='csc') * penalty
+        graph = scipy.sparse.vstack([weights, skips], format='csr')
+
+        row_ind, col_ind = scipy.sparse.csgraph.min_weight_full_bipartite_matching(graph)
+        real = row_ind < n
+        row_ind, col_ind = row_ind[real], col_ind[real]
+        order = np.argsort(row_ind)
+        row_ind, col_ind = row_ind[order], col_ind[order]
+        if len(row_ind) == 0:
+            return 0.0, np.zeros(0)
+        values = np.asarray(self.__params[row_ind, col_ind]).ravel()
+        return values.sum(), values
 
-        filtered_col = col[mask]
-        original_indices = np.where(mask)[0]
-        
-        if k == 1:
-            min_idx_local = np.argmin(filtered_col)
-            return filtered_col[min_idx_local], original_indices[min_idx_local]
-
-        k = min(k, len(filtered_col))
-        
-        partitioned_indices = np.argpartition(filtered_col, k - 1)
-        kth_smallest_idx_local = partitioned_indices[k - 1]
-        kth_val = filtered_col[kth_smallest_idx_local]
-        
-        return kth_val, original_indices[kth_smallest_idx_local]
-
-    def HungarianMinimum(self):
-        row_ind, col_ind = scipy.optimize.linear_sum_assignment(self.__params)
-        values = self.__params[row_ind, col_ind]
+    def __Assignment(self, maximize, backend, tolerance, workers):
+        params = self.__Values()
+        self.gap = 0.0
+        if backend == 'scipy':
+            if tolerance is not None:
+                raise ValueError("tolerance is supported by the 'auction' backend only")
+            if self.__sparse:
+                return self.__SparseAssignment(maximize)
+            if maximize not in self.__warm:
+                costs = -params if maximize else params
+                self.__warm[maximize] = WarmAssignment.WarmAssignment(costs, *scipy.optimize.linear_sum_assignment(costs))
+            row_ind, col_ind = self.__warm[maximize].Assignment()
+        elif backend == 'auction':
+            if self.__sparse:
+                raise ValueError("The 'auction' backend supports dense matrices only")
+            row_ind, col_ind, self.gap = AuctionSolver.AuctionAssignment(
+                params if maximize else -params, tolerance=tolerance, workers=workers
+            )
+        else:
+            raise ValueError("backend must be 'scipy' or 'auction'")
+
+        values = params[row_ind, col_ind]
         cost = values.sum()
         return cost, values
+
+    def HungarianMinimum(self, backend='scipy', tolerance=None, workers=1):
+        """
+        backend='auction' - аукционный алгоритм с eps-масштабированием для больших n;
+        при заданном tolerance стоимость отличается от оптимальной не более чем на tolerance.
+        Гарантированная граница отставания найденного назначения записывается в
+        self.gap (0 для точного решателя 'scipy').
+        """
+        return self.__Assignment(False, backend, tolerance, workers)
     
-    def HungarianMaximum(self):
-        row_ind, col_ind = scipy.optimize.linear_sum_assignment(-self.__params)
-        values = self.__params[row_ind, col_ind]
-        cost = values.sum()
-        return cost, values
+    def HungarianMaximum(self, backend='scipy', tolerance=None, workers=1):
+        return self.__Assignment(True, backend, tolerance, workers)
 
-    def ThriftyMethod(self):
-        cost = 0
-        _, cols = self.__params.shape
-        assigned_rows = set()
-        values = []
+    def __Edit(self, params, update):
+        # Изменение плотной матрицы; сохраненные назначения восстанавливаются
+        # увеличивающими путями вместо полного решения заново
+        if self.__sparse or self.__log:
+            raise ValueError("Matrix edits are supported for dense matrices only")
+        self.__params = params
+        self.__rows = None
+        for maximize, warm in self.__warm.items():
+            update(warm, -1 if maximize else 1)
 
-        for i in range(cols):
-            min_val, row = self.FindKMinInColumnWithExcludedRows(i, assigned_rows)
-            if row != -1:
-                cost += min_val
-                assigned_rows.add(row)
-                values.append(min_val)
-        
-        return cost, np.array(values)
-    
-    def GreedyMethod(self):
-        cost = 0
-        _, cols = self.__params.shape
-        assigned_rows = set()
-        values = []
+    def SetValue(self, row, col, value):
+        params = self.__params.astype(float)
+        params[row, col] = value
+        self.__Edit(params, lambda warm, sign: warm.SetValue(row, col, sign * value))
 
-        for i in range(cols):
-            max_val, row = self.FindMaxInColumnWithExcludedRows(i, assigned_rows)
-            if row != -1:
-                cost += max_val
-                assigned_rows.add(row)
-                values.append(max_val)
-        return cost, np.array(values)
+    def AddRow(self, values):
+        values = np.asarray(values, dtype=float)
+        self.__Edit(np.vstack([self.__params, values]), lambda warm, sign: warm.AddRow(sign * values))
 
-    def Greedy_ThriftyMethodX(self, x):
-        cost = 0
+    def DropRow(self, row):
+        self.__Edit(np.delete(self.__params, row, axis=0).astype(float), lambda warm, sign: warm.DropRow(row))
+
+    def AddColumn(self, values):
+        values = np.asarray(values, dtype=float)
+        self.__Edit(np.column_stack([self.__params, values]), lambda warm, sign: warm.AddColumn(sign * values))
+
+    def DropColumn(self, col):
+        self.__Edit(np.delete(self.__params, col, axis=1).astype(float), lambda warm, sign: warm.DropColumn(col))
+
+    def RunPolicy(self, policy):
+        """
+        Стратегия Policy на матрице: столбцы обходятся по порядку, строка дня
+        выбирается по правилу (code, param) среди свободных строк.
+        Возвращает стоимость и значения назначенных дней.
+        """
         _, cols = self.__params.shape
-        assigned_rows = set()
+        if len(policy) != cols:
+            raise ValueError("Policy length must match the number of days")
+        cost = 0
+        rows = self.__AvailableRows()
         values = []
 
         for i in range(cols):
-            if i < x:
-                val, row = self.FindMaxInColumnWithExcludedRows(i, assigned_rows)
-            else:
-                val, row = self.FindKMinInColumnWithExcludedRows(i, assigned_rows)
-            
+            val, row = rows.Select(i, policy.codes[i], policy.params[i])
             if row != -1:
                 cost += val
-                assigned_rows.add(row)
+                rows.Remove(row)
                 values.append(val)
 
         return cost, np.array(values)
-    
+
+    def ThriftyMethod(self):
+        return self.RunPolicy(Policy.Policy.ThriftyMethod(self.__params.shape[1]))
+
+    def GreedyMethod(self):
+        return self.RunPolicy(Policy.Policy.GreedyMethod(self.__params.shape[1]))
+
+    def Greedy_ThriftyMethodX(self, x):
+        return self.RunPolicy(Policy.Policy.Greedy_ThriftyMethodX(self.__params.shape[1], x))
+
     def Thrifty_GreedyMethodX(self, x):
-        cost = 0
+        return self.RunPolicy(Policy.Policy.Thrifty_GreedyMethodX(self.__params.shape[1], x))
+
+    def TkG_MethodX(self, k, x):
+        return self.RunPolicy(Policy.Policy.TkG_MethodX(self.__params.shape[1], k, x))
+
+    def __SelectKth(self, order, removed, runs, k, greedy, i):
+        # Для каждого набора вычеркнутых строк removed[runs[r]] - k[r]-я свободная строка
+        # столбца i по убыванию (greedy[r]) или по возрастанию значений.
+        # Сначала указатель несколько шагов продвигается по порядку столбца: обычно
+        # k-я свободная строка стоит в самом начале. Оставшиеся наборы добираются
+        # маскированным выбором по всему столбцу
+        rows = np.empty(len(k), dtype=np.intp)
+        position = np.zeros(len(k), dtype=np.intp)
+        found = np.zeros(len(k), dtype=np.intp)
+        active = np.arange(len(k))
+
+        for _ in range(POINTER_STEPS):
+            if not len(active):
+                return rows
+            candidates = np.where(greedy[active], order.descending[i][position[active]],
+                                  order.ascending[i][position[active]])
+            found[active] += ~removed[runs[active], candidates]
+            done = found[active] == k[active]
+            rows[active[done]] = candidates[done]
+            active = active[~done]
+            position[active] += 1
+
+        if len(active):
+            # Отрицание значений для жадного выбора сохраняет порядок строк при равенстве,
+            # как у устойчивой сортировки порядков
+            col = np.where(greedy[active, None], -self.__params[:, i], self.__params[:, i])
+            col[removed[runs[active]]] = np.inf
+            first = k[active] == 1
+            rows[active[first]] = np.argmin(col[first], axis=1)
+            if not first.all():
+                ranked = np.argsort(col[~first], axis=1, kind='stable')
+                rows[active[~first]] = ranked[np.arange(len(ranked)), k[active[~first]] - 1]
+
+        return rows
+
+    def __RunAll(self, prefix_k, switch, suffix_k):
+        # Одновременный прогон набора смешанных стратегий: прогон r берет k-й минимум
+        # с k = prefix_k[r] до столбца switch[r] и k = suffix_k[r] после него (k = 0 - максимум).
+        # Префикс общий для всех прогонов с одинаковым prefix_k и считается один раз;
+        # собственное состояние прогон получает только в столбце смены стратегии
+        n, cols = self.__params.shape
+        order = self.__AvailableRows()
+        prefix_rules, group = np.unique(prefix_k, return_inverse=True)
+        prefix_removed = np.zeros((len(prefix_rules), n), dtype=bool)
+        removed = np.zeros((len(prefix_k), n), dtype=bool)
+        values = np.zeros((len(prefix_k), cols))
+
+        for i in range(min(n, cols)):
+            # После i назначений свободно n - i строк
+            available = n - i
+
+            diverging = np.flatnonzero(switch == i)
+            removed[diverging] = prefix_removed[group[diverging]]
+
+            prefix_rows = self.__SelectKth(
+                order, prefix_removed, np.arange(len(prefix_rules)),
+                np.minimum(np.maximum(prefix_rules, 1), available), prefix_rules == 0, i
+            )
+            prefix_removed[np.arange(len(prefix_rules)), prefix_rows] = True
+
+            diverged = np.flatnonzero(switch <= i)
+            rows = prefix_rows[group]
+            rows[diverged] = self.__SelectKth(
+                order, removed, diverged, np.minimum(np.maximum(suffix_k[diverged], 1), available),
+                suffix_k[diverged] == 0, i
+            )
+            removed[diverged, rows[diverged]] = True
+
+            values[:, i] = self.__params[rows, i]
+
+        if self.__log:
+            assigned = min(n, cols)
+            values[:, :assigned] = np.exp(values[:, :assigned])
+
+        return values.sum(axis=1), values
+
+    def __SweepSparse(self, k_values):
+        # Для разреженной матрицы число допустимых строк в столбце у прогонов разное,
+        # поэтому прогоны выполняются по отдельности
         _, cols = self.__params.shape
-        assigned_rows = set()
-        values = []
 
-        for i in range(cols):
-            if i < x:
-                val, row = self.FindKMinInColumnWithExcludedRows(i, assigned_rows)
-            else:
-                val, row = self.FindMaxInColumnWithExcludedRows(i, assigned_rows)
-            
-            if row != -1:
-                cost += val
-                assigned_rows.add(row)
-                values.append(val)
+        def collect(runs):
+            costs = np.zeros(len(runs))
+            values = np.zeros((len(runs), cols))
+            for r, (cost, vals) in enumerate(runs):
+                costs[r] = cost
+                values[r, :len(vals)] = vals
+            return costs, values
 
-        return cost, np.array(values)
+        x_values = range(1, cols + 1)
+        tkg_costs, tkg_values = collect([self.TkG_MethodX(k, x) for k in k_values for x in x_values])
+        return {
+            'GreedyThrifty': collect([self.Greedy_ThriftyMethodX(x) for x in x_values]),
+            'ThriftyGreedy': collect([self.Thrifty_GreedyMethodX(x) for x in x_values]),
+            'ThriftyKeyGreedy': (tkg_costs.reshape(len(k_values), cols), tkg_values.reshape(len(k_values), cols, cols))
+        }
 
-    def TkG_MethodX(self, k, x):
-        cost = 0
+    def SweepTransitions(self, k_values=None):
+        """
+        Стоимости и значения по дням смешанных стратегий для всех этапов смены
+        x = 1..v (и всех k из k_values для TkG_MethodX) за один вызов.
+
+        Все прогоны выполняются одновременно: на каждый столбец приходится одна
+        векторная операция над общими отсортированными порядками строк.
+        Возвращает словарь:
+            'GreedyThrifty', 'ThriftyGreedy': (costs (v,), values (v, v)),
+            'ThriftyKeyGreedy': (costs (len(k_values), v), values (len(k_values), v, v)),
+        где строка x - 1 соответствует этапу x, а значения дополнены нулями в конце.
+        """
         _, cols = self.__params.shape
-        assigned_rows = set()
-        values = []
+        if k_values is None:
+            k_values = range(1, cols + 1)
+        k_values = np.array(list(k_values), dtype=int)
 
-        for i in range(cols):
-            if (i < x) and (i + k < cols):
-                val, row = self.FindKMinInColumnWithExcludedRows(i, assigned_rows, k)
-            else:
-                val, row = self.FindMaxInColumnWithExcludedRows(i, assigned_rows)
-                
-            if row != -1:
-                cost += val
-                assigned_rows.add(row)
-                values.append(val)
-        
-        return cost, np.array(values)
\ No newline at end of file
+        if self.__sparse:
+            return self.__SweepSparse(k_values)
+
+        x = np.arange(1, cols + 1)
+        ones = np.ones(cols, dtype=int)
+        zeros = np.zeros(cols, dtype=int)
+
+        results = {
+            'GreedyThrifty': self.__RunAll(zeros, x, ones),
+            'ThriftyGreedy': self.__RunAll(ones, x, zeros),
+        }
+
+        # В TkG_MethodX k-й минимум берется при i < min(x, v - k), поэтому при x >= v - k
+        # прогоны совпадают и считаются один раз
+        prefix_k = np.repeat(k_values, cols)
+        switch = np.clip(np.tile(x, len(k_values)), 0, np.maximum(cols - prefix_k, 0))
+        distinct, inverse = np.unique(np.stack([prefix_k, switch], axis=1), axis=0, return_inverse=True)
+        costs, values = self.__RunAll(distinct[:, 0], distinct[:, 1], np.zeros(len(distinct), dtype=int))
+        inverse = inverse.reshape(-1)
+        results['ThriftyKeyGreedy'] = (
+            costs[inverse].reshape(len(k_values), cols),
+            values[inverse].reshape(len(k_values), cols, cols)
+        )
+
+        return results
+
+class OnlineComputing:
+    """
+    Потоковая версия стратегий: этапы поступают по одному столбцу, и партия
+    на этап выбирается сразу по правилу дня из Policy. Между этапами хранится
+    только множество свободных партий (O(n)) и накопленная стоимость.
+    Недопустимые пары партия/этап задаются значением NaN; этап без
+    допустимых свободных партий пропускается.
+    """
+    def __init__(self, n, policy):
+        self.__policy = policy
+        self.__available = np.ones(n, dtype=bool)
+        self.day = 0
+        self.cost = 0.0
+
+    def Push(self, column):
+        """
+        Обрабатывает столбец очередного этапа.
+        Возвращает (номер выбранной партии или None, значение).
+        """
+        column = np.asarray(column, dtype=float)
+        if column.shape != self.__available.shape:
+            raise ValueError("column must contain one value per batch")
+        if self.day >= len(self.__policy):
+            raise ValueError("All days of the policy have already been processed")
+
+        code, param = self.__policy.codes[self.day], self.__policy.params[self.day]
+        self.day += 1
+        row = Policy.SelectRow(code, param, column, self.__available & ~np.isnan(column))
+        if row is None:
+            return None, 0.0
+
+        self.__available[row] = False
+        self.cost += column[row]
+        return row, column[row]
+
+    def Stream(self, columns):
+        # Столбцы берутся из любого итерируемого источника (генератор, чтение файла)
+        for column in columns:
+            yield self.Push(column)
+
+    @classmethod
+    def ThriftyMethod(cls, n, v):
+        return cls(n, Policy.Policy.ThriftyMethod(v))
+
+    @classmethod
+    def GreedyMethod(cls, n, v):
+        return cls(n, Policy.Policy.GreedyMethod(v))
+
+    @classmethod
+    def Greedy_ThriftyMethodX(cls, n, v, x):
+        return cls(n, Policy.Policy.Greedy_ThriftyMethodX(v, x))
+
+    @classmethod
+    def Thrifty_GreedyMethodX(cls, n, v, x):
+        return cls(n, Policy.Policy.Thrifty_GreedyMethodX(v, x))
+
+    @classmethod
+    def TkG_MethodX(cls, n, v, k, x):
+        return cls(n, Policy.Policy.TkG_MethodX(v, k, x))
+
+
+class BatchComputing:
+    """
+    Пакетная версия Computing: стратегии вычисляются сразу для стопки
+    матриц формы (experiments, n, v) одним векторизованным проходом по оси
+    экспериментов. Методы возвращают массив стоимостей (experiments,) и
+    массив значений по дням (experiments, v); дни без назначения равны 0.
+    Стратегии являются предустановками Policy.
+    Стопка FactoredMatrix (например, из MatrixGenerator.GenerateFactoredBatch)
+    хранится как log C в своем dtype; стратегии считаются по логарифмам,
+    а плотная C строится только для венгерского алгоритма.
+    """
+    def __init__(self, matrices):
+        self.__log = isinstance(matrices, FactoredMatrix)
+        self.__params = matrices.Log() if self.__log else np.asarray(matrices, dtype=float)
+        if self.__params.ndim != 3:
+            raise ValueError("matrices must be an (experiments x n x v) array")
+
+    def EvaluatePolicies(self, policies):
+        return Policy.EvaluatePolicies(policies, self.__params, log=self.__log)
+
+    def __Values(self):
+        # Стопка в исходной шкале для решателей назначения
+        return np.exp(self.__params, dtype=float) if self.__log else self.__params
+
+    def __Run(self, policy):
+        costs, values = self.EvaluatePolicies([policy])
+        return costs[0], values[0]
+
+    def __AssignmentValues(self, params, row_ind, col_ind):
+        # Значения оптимального назначения, разложенные по дням (столбцам)
+        experiments = np.arange(params.shape[0])[:, None]
+        values = np.zeros((params.shape[0], params.shape[2]))
+        values[experiments, col_ind] = params[experiments, row_ind, col_ind]
+        return values.sum(axis=1), values
+
+    def HungarianMinimum(self, workers=1):
+        params = self.__Values()
+        return self.__AssignmentValues(params, *BatchAssignment.LinearSumAssignmentBatch(params, workers=workers))
+
+    def HungarianMaximum(self, workers=1):
+        params = self.__Values()
+        return self.__AssignmentValues(
+            params, *BatchAssignment.LinearSumAssignmentBatch(params, maximize=True, workers=workers)
+        )
+
+    def HungarianMinMax(self, workers=1):
+        """
+        Оптимумы минимизации и максимизации для всей стопки за один проход.
+        Возвращает ((costs, values) минимума, (costs, values) максимума).
+        """
+        params = self.__Values()
+        minimum, maximum = BatchAssignment.MinMaxAssignments(params, workers=workers)
+        return self.__AssignmentValues(params, *minimum), self.__AssignmentValues(params, *maximum)
+
+    def ThriftyMethod(self):
+        return self.__Run(Policy.Policy.ThriftyMethod(self.__params.shape[2]))
+
+    def GreedyMethod(self):
+        return self.__Run(Policy.Policy.GreedyMethod(self.__params.shape[2]))
+
+    def Greedy_ThriftyMethodX(self, x):
+        return self.__Run(Policy.Policy.Greedy_ThriftyMethodX(self.__params.shape[2], x))
+
+    def Thrifty_GreedyMethodX(self, x):
+        return self.__Run(Policy.Policy.Thrifty_GreedyMethodX(self.__params.shape[2], x))
+
+    def TkG_MethodX(self, k, x):
+        return self.__Run(Policy.Policy.TkG_MethodX(self.__params.shape[2], k, x))
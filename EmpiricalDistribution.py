@@ -0,0 +1,102 @@
+import numpy as np
+
+# Ширина ядра в единицах bandwidth, после которой вклад гауссиана отбрасывается
+KERNEL_CUTOFF = 4
+
+
+class EmpiricalDistribution:
+    """
+    Распределение, построенное по историческим замерам (сахаристость,
+    суточные коэффициенты деградации).
+
+    method='alias' - выборка из самих замеров (с повторами) по таблице
+    псевдонимов Уолкера: одна случайная ячейка и одно сравнение на число.
+    method='kde' - гауссова ядерная оценка плотности, посчитанная один раз
+    на сетке из grid_size узлов (линейное распределение замеров по узлам и
+    свертка с ядром); выборка - ячейка сетки по таблице псевдонимов и
+    равномерный сдвиг внутри нее.
+    Quantile(u) - обратная функция распределения для квазислучайных выборок.
+    """
+    def __init__(self, samples, method="alias", grid_size=1024, bandwidth=None):
+        samples = np.asarray(samples, dtype=float).ravel()
+        samples = samples[np.isfinite(samples)]
+        if len(samples) == 0:
+            raise ValueError("samples must contain at least one finite value")
+        if method not in ("alias", "kde"):
+            raise ValueError("method must be 'alias' or 'kde'")
+        self.method = method
+
+        if method == "alias" or np.ptp(samples) == 0:
+            self.values, counts = np.unique(samples, return_counts=True)
+            self.width = 0.0
+            probabilities = counts / counts.sum()
+        else:
+            if bandwidth is None:
+                # Правило Сильвермана
+                spread = min(np.std(samples), np.subtract(*np.percentile(samples, [75, 25])) / 1.34) or np.std(samples)
+                bandwidth = 0.9 * spread * len(samples) ** -0.2
+            lo = samples.min() - KERNEL_CUTOFF * bandwidth
+            hi = samples.max() + KERNEL_CUTOFF * bandwidth
+            self.width = (hi - lo) / grid_size
+            # Узлы - левые края ячеек; плотность считается в их центрах
+            self.values = lo + self.width * np.arange(grid_size)
+            probabilities = self.__GridDensity(samples, lo, grid_size, bandwidth)
+
+        self.cdf = np.cumsum(probabilities)
+        self.cdf /= self.cdf[-1]
+        self.probability, self.alias = self.__AliasTable(probabilities)
+
+    def __GridDensity(self, samples, lo, grid_size, bandwidth):
+        # Линейное разнесение замеров по центрам ячеек и свертка с усеченным гауссианом
+        position = (samples - lo) / self.width - 0.5
+        left = np.clip(np.floor(position).astype(int), 0, grid_size - 1)
+        right = np.minimum(left + 1, grid_size - 1)
+        fraction = np.clip(position - left, 0, 1)
+        counts = np.bincount(left, 1 - fraction, grid_size) + np.bincount(right, fraction, grid_size)
+
+        radius = int(np.ceil(KERNEL_CUTOFF * bandwidth / self.width))
+        offsets = np.arange(-radius, radius + 1) * self.width
+        kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2)
+        density = np.convolve(counts, kernel)[radius:radius + grid_size]
+        return density / density.sum()
+
+    @staticmethod
+    def __AliasTable(probabilities):
+        # Метод Воуза: ячейка i хранит свою долю probability[i] и псевдоним alias[i]
+        size = len(probabilities)
+        scaled = probabilities * size
+        probability = np.ones(size)
+        alias = np.arange(size)
+        small = list(np.flatnonzero(scaled < 1))
+        large = list(np.flatnonzero(scaled >= 1))
+        while small and large:
+            less, more = small.pop(), large.pop()
+            probability[less] = scaled[less]
+            alias[less] = more
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+        return probability, alias
+
+    @classmethod
+    def FromFile(cls, path, delimiter=None, **kwargs):
+        # Все числа текстового файла (по одному или по несколько в строке)
+        return cls(np.loadtxt(path, delimiter=delimiter, ndmin=1), **kwargs)
+
+    def Sample(self, rng, size):
+        cells = rng.integers(len(self.values), size=size)
+        keep = rng.random(size) < self.probability[cells]
+        cells = np.where(keep, cells, self.alias[cells])
+        if self.width == 0:
+            return self.values[cells]
+        return self.values[cells] + self.width * rng.random(size)
+
+    def Quantile(self, u):
+        u = np.asarray(u, dtype=float)
+        cells = np.minimum(np.searchsorted(self.cdf, u, side="right"), len(self.values) - 1)
+        if self.width == 0:
+            return self.values[cells]
+        # Линейная интерполяция функции распределения внутри ячейки
+        below = np.where(cells > 0, self.cdf[cells - 1], 0.0)
+        mass = self.cdf[cells] - below
+        inside = np.divide(u - below, mass, out=np.zeros_like(u), where=mass > 0)
+        return self.values[cells] + self.width * np.clip(inside, 0, 1)
@@ -0,0 +1,50 @@
+import numpy as np
+
+
+class FactoredMatrix:
+    """
+    Матрица C (n, v) или стопка матриц (m, n, v), заданная множителями:
+    c_i1 = a_i, c_ij = a_i * b_i1 * ... * b_i(j-1).
+
+    Хранятся только a (..., n) и B (..., n, v - 1), при dtype=np.float32 - в
+    одинарной точности. Log() строит log C накопленными суммами логарифмов
+    (в float64), поэтому длинные горизонты (v в тысячах), на которых
+    произведение исчезает в нуль, остаются различимыми. Computing и
+    BatchComputing выбирают строки по log C; np.asarray(matrix) дает
+    плотную матрицу для остальных решателей.
+    """
+    def __init__(self, a, b, dtype=np.float64):
+        self.dtype = np.dtype(dtype)
+        self.a = np.asarray(a, dtype=self.dtype)
+        self.b = np.asarray(b, dtype=self.dtype)
+        if self.b.ndim < 2 or self.a.shape != self.b.shape[:-1]:
+            raise ValueError("a must have shape (..., n) and b shape (..., n, v - 1)")
+        if np.any(self.a <= 0) or np.any(self.b <= 0):
+            raise ValueError("a and b must be positive")
+        self.shape = self.b.shape[:-1] + (self.b.shape[-1] + 1,)
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, index):
+        # Часть стопки по первой оси
+        if self.ndim != 3:
+            raise TypeError("only stacks of factored matrices can be indexed")
+        return FactoredMatrix(self.a[index], self.b[index], self.dtype)
+
+    def Log(self):
+        log_c = np.empty(self.shape, dtype=self.dtype)
+        log_a = np.log(self.a, dtype=np.float64)
+        log_c[..., 0] = log_a
+        log_c[..., 1:] = log_a[..., None] + np.cumsum(np.log(self.b, dtype=np.float64), axis=-1)
+        return log_c
+
+    def Dense(self, dtype=None):
+        return np.exp(self.Log(), dtype=dtype or np.float64)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.Dense(dtype)
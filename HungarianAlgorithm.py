@@ -1,239 +1,363 @@
 import numpy as np
+from StepTrace import StepTrace, TraceReplay, SaveTrace
 
-class HungarianAlgorithm:
-    def __init__(self, matrix, mode='min'):
-        self.original_matrix = np.array(matrix, dtype=float)
+# Этапы, записываемые на каждом уровне детализации (None - все)
+DETAIL_STAGES = {
+    'full': None,
+    'iteration': {'INIT', 'STEP_1', 'STEP_2', 'STEP_3', 'STEP_7_LINES', 'STEP_8_MIN', 'STEP_8_UPDATE', 'DONE'},
+    'result': {'INIT', 'DONE'},
+}
+class HungarianAlgorithm(TraceReplay):
+    def __init__(self, matrix, mode='min', marking='greedy', engine='reduction', decimals=None, detail='full'):
+        original_matrix = np.array(matrix, dtype=float)
+        # decimals: точная арифметика - матрица переводится в int64 с фиксированной
+        # точкой (10^decimals), нули и шаг 8 считаются без погрешностей округления
+        self.decimals = decimals
+        self.scale = 1 if decimals is None else 10 ** decimals
+        # Состояние: шаги хранятся ключевыми кадрами и дельтами
+        super().__init__(StepTrace(original_matrix.shape, scale=self.scale), original_matrix, mode)
         self.n = self.original_matrix.shape[0]
-        self.mode = mode
+        # 'greedy' - шаги 4-6 учебника; 'matching' - жадная отметка дополняется
+        # до наибольшего числа независимых нулей увеличивающими цепочками
+        if marking not in ('greedy', 'matching'):
+            raise ValueError("marking must be 'greedy' or 'matching'")
+        self.marking = marking
+        # 'reduction' - учебный цикл шагов 4-8; 'potentials' - кратчайшие
+        # увеличивающие цепочки с потенциалами строк и столбцов, O(n^3)
+        if engine not in ('reduction', 'potentials'):
+            raise ValueError("engine must be 'reduction' or 'potentials'")
+        self.engine = engine
+        # 'full' - каждое событие отметки; 'iteration' - только итоги шагов 2, 3, 7, 8;
+        # 'result' - начало и ответ. Незаписываемые шаги не сохраняются вовсе
+        if detail not in DETAIL_STAGES:
+            raise ValueError("detail must be 'full', 'iteration' or 'result'")
+        self.detail = detail
+        # Номер итерации (0 - приведение матрицы) для каждого записанного шага;
+        # итерация full_iteration записывается полностью при любом уровне
+        self.iteration = 0
+        self.full_iteration = None
+        self.step_iterations = []
         
         # Рабочая матрица
-        self.matrix = self.original_matrix.copy()
-            
-        # Состояние
-        self.steps = []
-        self.current_step_index = -1
+        if decimals is None:
+            self.matrix = self.original_matrix.copy()
+        else:
+            self.matrix = np.rint(self.original_matrix * self.scale).astype(np.int64)
         
-        # Состояние алгоритма
-        self.marked_zeros = [] # Список (r, c)
-        self.crossed_zeros = [] # Список (r, c)
-        self.h_lines = [] # Список индексов строк
-        self.v_lines = [] # Список индексов столбцов
+        # Состояние алгоритма (маски n x n и n)
+        self.stars = np.zeros((self.n, self.n), dtype=bool) # Отмеченные нули
+        self.crossed = np.zeros((self.n, self.n), dtype=bool) # Зачеркнутые нули
+        self.row_covered = np.zeros(self.n, dtype=bool) # Горизонтальные линии
+        self.col_covered = np.zeros(self.n, dtype=bool) # Вертикальные линии
         
         self.save_step("Начало работы. Инициализация.", "INIT")
         
-        self.run_algorithm()
-        self.current_step_index = 0
+        # Алгоритм выполняется лениво: генератор останавливается после каждого шага
+        self.runner = self.run_potentials() if engine == 'potentials' else self.run_algorithm()
 
     def save_step(self, description, stage):
-        stars = np.zeros((self.n, self.n), dtype=bool)
-        for r, c in self.marked_zeros:
-            stars[r, c] = True
-            
+        # Записывает шаг, если он нужен при текущей детализации; True - шаг записан
+        stages = DETAIL_STAGES[self.detail]
+        if stages is not None and stage not in stages and self.iteration != self.full_iteration:
+            return False
         # Используем слот 'primes' для зачеркнутых нулей
-        crossed = np.zeros((self.n, self.n), dtype=bool)
-        for r, c in self.crossed_zeros:
-            crossed[r, c] = True
-            
-        row_covered = np.zeros(self.n, dtype=bool)
-        for r in self.h_lines:
-            row_covered[r] = True
-            
-        col_covered = np.zeros(self.n, dtype=bool)
-        for c in self.v_lines:
-            col_covered[c] = True
-
-        step_data = {
-            'matrix': self.matrix.copy(),
-            'stars': stars,
-            'primes': crossed, 
-            'row_covered': row_covered,
-            'col_covered': col_covered,
-            'description': description,
-            'stage': stage
-        }
-        self.steps.append(step_data)
+        self.steps.append(self.matrix, self.stars, self.crossed,
+                          self.row_covered, self.col_covered, description, stage)
+        self.step_iterations.append(self.iteration)
+        return True
 
-    def run_algorithm(self):
+    def display_value(self, value):
+        # Значение рабочей матрицы в исходных единицах для описания шага
+        return value / self.scale if self.scale != 1 else value
+
+    def mark_zero(self, r, c, cross_row, cross_col):
+        # Отмечает ноль (r, c) и зачеркивает свободные нули в его строке и/или столбце
+        self.stars[r, c] = True
+        free = (self.matrix == 0) & ~self.stars & ~self.crossed
+        if cross_row:
+            self.crossed[r, :] |= free[r, :]
+        if cross_col:
+            self.crossed[:, c] |= free[:, c]
+
+    def augmenting_path(self, zero_mask):
+        # Кратчайшая увеличивающая цепочка (поиск в ширину сразу от всех строк без отметки):
+        # строка -> столбец по нулю, столбец -> строка по отмеченному нулю.
+        # Возвращает список клеток (r, c), которые станут отмеченными, или None
+        has_star_row = self.stars.any(axis=1)
+        has_star_col = self.stars.any(axis=0)
+        star_col = np.where(has_star_row, self.stars.argmax(axis=1), -1)
+        star_row = np.where(has_star_col, self.stars.argmax(axis=0), -1)
+
+        parent = np.full(self.n, -1) # Строка, из которой достигнут столбец
+        visited_cols = np.zeros(self.n, dtype=bool)
+        frontier = np.flatnonzero(~has_star_row)
+
+        while len(frontier):
+            reach = zero_mask[frontier] & ~visited_cols
+            new_cols = np.flatnonzero(reach.any(axis=0))
+            if not len(new_cols):
+                return None
+            parent[new_cols] = frontier[np.argmax(reach[:, new_cols], axis=0)]
+            visited_cols[new_cols] = True
+
+            free_cols = new_cols[~has_star_col[new_cols]]
+            if len(free_cols):
+                path = []
+                c = free_cols[0]
+                while c != -1:
+                    r = parent[c]
+                    path.append((r, c))
+                    c = star_col[r]
+                return path
+            # Каждая отмеченная строка достижима только через свой столбец
+            frontier = star_row[new_cols]
+        return None
+
+    def reduce_matrix(self):
         # Шаг 1
         if self.mode == 'max':
-            for r in range(self.n):
-                max_val = np.max(self.matrix[r, :])
-                self.matrix[r, :] = max_val - self.matrix[r, :]
-            self.save_step("Шаг 1: (Максимизация) Вычитание элементов из максимума строки.", "STEP_1")
+            self.matrix = self.matrix.max(axis=1, keepdims=True) - self.matrix
+            if self.save_step("Шаг 1: (Максимизация) Вычитание элементов из максимума строки.", "STEP_1"):
+                yield
         
         # Шаг 2
-        for r in range(self.n):
-            min_val = np.min(self.matrix[r, :])
-            self.matrix[r, :] -= min_val
-        self.save_step("Шаг 2: Вычитание минимума строки из всех элементов строки.", "STEP_2")
+        self.matrix -= self.matrix.min(axis=1, keepdims=True)
+        if self.save_step("Шаг 2: Вычитание минимума строки из всех элементов строки.", "STEP_2"):
+            yield
         
         # Шаг 3
-        for c in range(self.n):
-            min_val = np.min(self.matrix[:, c])
-            self.matrix[:, c] -= min_val
-        self.save_step("Шаг 3: Вычитание минимума столбца из всех элементов столбца.", "STEP_3")
+        self.matrix -= self.matrix.min(axis=0, keepdims=True)
+        if self.save_step("Шаг 3: Вычитание минимума столбца из всех элементов столбца.", "STEP_3"):
+            yield
+
+    def extend_marks(self):
+        # Увеличивающими цепочками доводит отметку до наибольшего числа независимых нулей
+        zero_mask = self.matrix == 0
+        path = self.augmenting_path(zero_mask)
+        while path is not None:
+            rows = [r for r, _ in path]
+            cols = [c for _, c in path]
+            self.stars[rows, :] = False
+            self.stars[rows, cols] = True
+            self.crossed = zero_mask & ~self.stars
+            self.row_covered[:] = False
+            self.col_covered[:] = False
+            start, end = path[-1], path[0]
+            if self.save_step(f"Шаг 6: Увеличивающая цепочка от строки {start[0]+1} до столбца {end[1]+1}. Отмеченные нули перераспределены, их стало на один больше.", "STEP_6"):
+                yield
+            path = self.augmenting_path(zero_mask)
+
+    def run_algorithm(self):
+        yield from self.reduce_matrix()
         
+        # Продолжить текущую отметку увеличивающими цепочками вместо новой жадной
+        extend = False
         while True:
+            self.iteration += 1
             # Шаги 4-6: Отметка нулей
-            self.marked_zeros = []
-            self.crossed_zeros = []
-            self.h_lines = []
-            self.v_lines = []
+            if not extend:
+                self.stars[:] = False
+                self.crossed[:] = False
+            self.row_covered[:] = False
+            self.col_covered[:] = False
             
-            while True:
-                progress = False
-                
-                # Получаем все нули, которые не отмечены и не зачеркнуты
-                zeros = []
-                for r in range(self.n):
-                    for c in range(self.n):
-                        if self.matrix[r, c] == 0 and (r, c) not in self.marked_zeros and (r, c) not in self.crossed_zeros:
-                            zeros.append((r, c))
-                
-                if not zeros:
+            while not extend:
+                # Все нули, которые не отмечены и не зачеркнуты
+                zeros = (self.matrix == 0) & ~self.stars & ~self.crossed
+                if not zeros.any():
                     break
                 
-                row_counts = {}
-                col_counts = {}
-                
-                for r, c in zeros:
-                    row_counts[r] = row_counts.get(r, 0) + 1
-                    col_counts[c] = col_counts.get(c, 0) + 1
-                
                 # Шаг 4: Строка с ровно одним нулем
-                found_step_4 = False
-                for r in sorted(row_counts.keys()):
-                    if row_counts[r] == 1:
-                        target_c = -1
-                        for c_candidate in range(self.n):
-                            if (r, c_candidate) in zeros:
-                                target_c = c_candidate
-                                break
-                        
-                        if target_c != -1:
-                            self.marked_zeros.append((r, target_c))
-                            for r_other in range(self.n):
-                                if r_other != r and self.matrix[r_other, target_c] == 0 and (r_other, target_c) not in self.marked_zeros and (r_other, target_c) not in self.crossed_zeros:
-                                    self.crossed_zeros.append((r_other, target_c))
-                            
-                            self.save_step(f"Шаг 4: В строке {r+1} один ноль ({r+1}, {target_c+1}). Отмечаем его, зачеркиваем нули в столбце.", "STEP_4")
-                            progress = True
-                            found_step_4 = True
-                            break 
-                
-                if found_step_4:
-                    continue 
+                single_rows = np.flatnonzero(zeros.sum(axis=1) == 1)
+                if len(single_rows):
+                    r = single_rows[0]
+                    target_c = np.argmax(zeros[r])
+                    self.mark_zero(r, target_c, cross_row=False, cross_col=True)
+                    if self.save_step(f"Шаг 4: В строке {r+1} один ноль ({r+1}, {target_c+1}). Отмечаем его, зачеркиваем нули в столбце.", "STEP_4"):
+                        yield
+                    continue
                 
                 # Шаг 5: Столбец с ровно одним нулем
-                found_step_5 = False
-                for c in sorted(col_counts.keys()):
-                    if col_counts[c] == 1:
-                        target_r = -1
-                        for r_candidate in range(self.n):
-                            if (r_candidate, c) in zeros:
-                                target_r = r_candidate
-                                break
-                        
-                        if target_r != -1:
-                            self.marked_zeros.append((target_r, c))
-                            for c_other in range(self.n):
-                                if c_other != c and self.matrix[target_r, c_other] == 0 and (target_r, c_other) not in self.marked_zeros and (target_r, c_other) not in self.crossed_zeros:
-                                    self.crossed_zeros.append((target_r, c_other))
-                            
-                            self.save_step(f"Шаг 5: В столбце {c+1} один ноль ({target_r+1}, {c+1}). Отмечаем его, зачеркиваем нули в строке.", "STEP_5")
-                            progress = True
-                            found_step_5 = True
-                            break
-                
-                if found_step_5:
+                single_cols = np.flatnonzero(zeros.sum(axis=0) == 1)
+                if len(single_cols):
+                    c = single_cols[0]
+                    target_r = np.argmax(zeros[:, c])
+                    self.mark_zero(target_r, c, cross_row=True, cross_col=False)
+                    if self.save_step(f"Шаг 5: В столбце {c+1} один ноль ({target_r+1}, {c+1}). Отмечаем его, зачеркиваем нули в строке.", "STEP_5"):
+                        yield
                     continue
 
-                # Шаг 6: Произвольный ноль
-                if zeros:
-                    r, c = zeros[0]
-                    self.marked_zeros.append((r, c))
-                    
-                    for c_other in range(self.n):
-                         if c_other != c and self.matrix[r, c_other] == 0 and (r, c_other) not in self.marked_zeros and (r, c_other) not in self.crossed_zeros:
-                                    self.crossed_zeros.append((r, c_other))
-                    for r_other in range(self.n):
-                         if r_other != r and self.matrix[r_other, c] == 0 and (r_other, c) not in self.marked_zeros and (r_other, c) not in self.crossed_zeros:
-                                    self.crossed_zeros.append((r_other, c))
-                                    
-                    self.save_step(f"Шаг 6: Выбираем произвольный ноль ({r+1}, {c+1}). Отмечаем, зачеркиваем соседей.", "STEP_6")
-                    progress = True
-                    
-                if not progress:
-                    break
+                # Шаг 6: Произвольный ноль (первый по строкам)
+                r, c = np.unravel_index(np.argmax(zeros), zeros.shape)
+                self.mark_zero(r, c, cross_row=True, cross_col=True)
+                if self.save_step(f"Шаг 6: Выбираем произвольный ноль ({r+1}, {c+1}). Отмечаем, зачеркиваем соседей.", "STEP_6"):
+                    yield
+            
+            # Шаг 6 (режим 'matching'): дополняем отметку до наибольшего паросочетания нулей
+            if self.marking == 'matching' or extend:
+                yield from self.extend_marks()
+            extend = False
             
             # Шаг 7: Проверка оптимальности
-            if len(self.marked_zeros) == self.n:
-                self.save_step("Шаг 7: Оптимальное решение найдено (N отмеченных нулей).", "DONE")
+            marked_count = np.count_nonzero(self.stars)
+            if marked_count == self.n:
+                if self.save_step("Шаг 7: Оптимальное решение найдено (N отмеченных нулей).", "DONE"):
+                    yield
                 break
             
             # Проводим линии (Алгоритм Кенига)
-            rows_with_marked = set(r for r, c in self.marked_zeros)
-            marked_rows_konig = set([r for r in range(self.n) if r not in rows_with_marked])
-            marked_cols_konig = set()
+            zero_mask = self.matrix == 0
+            marked_rows_konig = ~self.stars.any(axis=1)
+            marked_cols_konig = np.zeros(self.n, dtype=bool)
             
             while True:
-                added = False
-                for r in marked_rows_konig:
-                    for c in range(self.n):
-                        if self.matrix[r, c] == 0 and c not in marked_cols_konig:
-                            marked_cols_konig.add(c)
-                            added = True
-                
-                for r, c in self.marked_zeros:
-                    if c in marked_cols_konig and r not in marked_rows_konig:
-                        marked_rows_konig.add(r)
-                        added = True
-                
-                if not added:
+                cols = marked_cols_konig | zero_mask[marked_rows_konig].any(axis=0)
+                rows = marked_rows_konig | self.stars[:, cols].any(axis=1)
+                if np.array_equal(cols, marked_cols_konig) and np.array_equal(rows, marked_rows_konig):
                     break
+                marked_rows_konig, marked_cols_konig = rows, cols
             
-            self.h_lines = [r for r in range(self.n) if r not in marked_rows_konig]
-            self.v_lines = list(marked_cols_konig)
+            self.row_covered = ~marked_rows_konig
+            self.col_covered = marked_cols_konig
             
-            self.save_step(f"Шаг 7: Решение не оптимально ({len(self.marked_zeros)}/{self.n}). Проводим минимальное число линий.", "STEP_7_LINES")
+            if self.save_step(f"Шаг 7: Решение не оптимально ({marked_count}/{self.n}). Проводим минимальное число линий.", "STEP_7_LINES"):
+                yield
             
             # Шаг 8: Обновление матрицы
-            min_val = float('inf')
-            for r in range(self.n):
-                if r in self.h_lines: continue
-                for c in range(self.n):
-                    if c in self.v_lines: continue
-                    if self.matrix[r, c] < min_val:
-                        min_val = self.matrix[r, c]
+            uncovered = ~self.row_covered[:, None] & ~self.col_covered[None, :]
+            if not uncovered.any():
+                # Линий больше, чем отмеченных нулей: жадная отметка не наибольшая,
+                # ее продолжают увеличивающие цепочки (иначе шаг 8 не меняет матрицу)
+                extend = True
+                continue
+            min_val = self.matrix[uncovered].min()
             
-            self.save_step(f"Шаг 8: Минимальный незачеркнутый элемент: {min_val}.", "STEP_8_MIN")
+            if self.save_step(f"Шаг 8: Минимальный незачеркнутый элемент: {self.display_value(min_val)}.", "STEP_8_MIN"):
+                yield
             
-            for r in range(self.n):
-                for c in range(self.n):
-                    if r not in self.h_lines and c not in self.v_lines:
-                        self.matrix[r, c] -= min_val
-                    
-                    if r in self.h_lines and c in self.v_lines:
-                        self.matrix[r, c] += min_val
+            self.matrix[uncovered] -= min_val
+            self.matrix[self.row_covered[:, None] & self.col_covered[None, :]] += min_val
             
-            self.save_step("Шаг 8: Матрица обновлена. Возврат к шагу 4.", "STEP_8_UPDATE")
+            if self.save_step("Шаг 8: Матрица обновлена. Возврат к шагу 4.", "STEP_8_UPDATE"):
+                yield
 
-    def get_current_state(self):
-        if 0 <= self.current_step_index < len(self.steps):
-            return self.steps[self.current_step_index]
-        return None
+    def run_potentials(self):
+        # Шаги 1-3 дают неотрицательную матрицу; дальше свободные строки по одной
+        # присоединяются кратчайшими увеличивающими цепочками (Джонкер - Волгенант).
+        # Приведенная матрица base - u - v остается неотрицательной, а сдвиг потенциалов
+        # по просмотренным строкам и столбцам - это в точности шаг 8 с линиями через
+        # непросмотренные строки и просмотренные столбцы
+        yield from self.reduce_matrix()
 
-    def next(self):
-        if self.current_step_index < len(self.steps) - 1:
-            self.current_step_index += 1
-            return self.get_current_state()
-        return None
+        base = self.matrix.copy()
+        # В режиме точной арифметики потенциалы и расстояния тоже целые
+        dtype = base.dtype
+        unreached = np.inf if dtype.kind == 'f' else np.iinfo(dtype).max
+        u = np.zeros(self.n, dtype=dtype)
+        v = np.zeros(self.n, dtype=dtype)
+        col4row = np.full(self.n, -1)
+        row4col = np.full(self.n, -1)
 
-    def prev(self):
-        if self.current_step_index > 0:
-            self.current_step_index -= 1
-            return self.get_current_state()
-        return None
-    
-    def is_finished(self):
-        return self.current_step_index == len(self.steps) - 1
+        for start in range(self.n):
+            self.iteration = start + 1
+            shortest = np.full(self.n, unreached, dtype=dtype)
+            path = np.full(self.n, -1)
+            scanned_cols = np.zeros(self.n, dtype=bool)
+            scanned_rows = [start]
+            row, min_val = start, dtype.type(0)
+
+            while True:
+                reduced = min_val + base[row] - u[row] - v
+                better = ~scanned_cols & (reduced < shortest)
+                shortest[better] = reduced[better]
+                path[better] = row
+
+                remaining = np.where(scanned_cols, unreached, shortest)
+                sink = np.argmin(remaining)
+                min_val = remaining[sink]
+                scanned_cols[sink] = True
+                if row4col[sink] == -1:
+                    break
+                row = row4col[sink]
+                scanned_rows.append(row)
+
+            if min_val > 0:
+                self.row_covered[:] = True
+                self.row_covered[scanned_rows] = False
+                self.col_covered[:] = scanned_cols
+                if self.save_step(f"Шаг 7: Отмечено {start}/{self.n} нулей. Поиск цепочки из строки {start+1}: линии через непросмотренные строки и просмотренные столбцы.", "STEP_7_LINES"):
+                    yield
+                if self.save_step(f"Шаг 8: Длина кратчайшей цепочки (сдвиг потенциалов): {self.display_value(min_val)}.", "STEP_8_MIN"):
+                    yield
+
+            u[start] += min_val
+            for row in scanned_rows[1:]:
+                u[row] += min_val - shortest[col4row[row]]
+            v[scanned_cols] -= min_val - shortest[scanned_cols]
+
+            # Ребра дерева поиска после сдвига жесткие: нули без погрешности округления
+            tree_cols = np.flatnonzero(scanned_cols)
+            self.matrix = base - u[:, None] - v[None, :]
+            self.matrix[path[tree_cols], tree_cols] = 0
+            self.matrix[self.stars] = 0
+            self.crossed[:] = False
+            self.crossed[path[tree_cols], tree_cols] = True
+            self.crossed &= ~self.stars
+
+            if min_val > 0:
+                if self.save_step("Шаг 8: Потенциалы строк и столбцов обновлены. Цепочка проходит по нулям.", "STEP_8_UPDATE"):
+                    yield
+
+            col = sink
+            while True:
+                row = path[col]
+                row4col[col] = row
+                col, col4row[row] = col4row[row], col
+                if row == start:
+                    break
+
+            self.stars[:] = False
+            self.stars[np.arange(start + 1), col4row[:start + 1]] = True
+            self.crossed[:] = False
+            self.row_covered[:] = False
+            self.col_covered[:] = False
+            if self.save_step(f"Шаг 6: Чередуем отметки вдоль цепочки от строки {start+1} до столбца {sink+1}. Отмечено {start+1} нулей.", "STEP_6"):
+                yield
+
+        if self.save_step("Шаг 7: Оптимальное решение найдено (N отмеченных нулей).", "DONE"):
+            yield
+
+    def produce_step(self):
+        # Продвигает алгоритм до следующего записанного шага; False, если шагов больше нет
+        if self.runner is None:
+            return False
+        try:
+            next(self.runner)
+            return True
+        except StopIteration:
+            self.runner = None
+            return False
+
+    def run_to_end(self):
+        # Досчитывает все оставшиеся шаги
+        while self.produce_step():
+            pass
+
+    def drill_down(self, index):
+        """
+        Полная детализация итерации, к которой относится записанный шаг index.
+        Возвращает новый трассировщик с теми же параметрами, стоящий на первом
+        шаге этой итерации; предыдущие итерации проходятся без записи шагов.
+        """
+        algorithm = HungarianAlgorithm(self.original_matrix, self.mode, self.marking,
+                                       self.engine, self.decimals, self.detail)
+        algorithm.full_iteration = self.step_iterations[index]
+        while algorithm.step_iterations[-1] < algorithm.full_iteration and algorithm.produce_step():
+            pass
+        algorithm.current_step_index = len(algorithm.steps) - 1
+        return algorithm
+
+    def export(self, path):
+        # Досчитывает трассировку и сохраняет ее для просмотра без пересчета (LoadTrace)
+        self.run_to_end()
+        SaveTrace(path, self.steps, self.original_matrix, self.mode)
@@ -1,9 +1,38 @@
 import numpy as np
+import copy
+import warnings
+from scipy.stats import qmc
 from typing import Tuple, Dict
 from accessify import private
+from EmpiricalDistribution import EmpiricalDistribution
+from FactoredMatrix import FactoredMatrix
+
+# Распределения сахаристости и коэффициентов деградации
+DISTRIBUTIONS = ("uniform", "concentrated", "empirical")
+
+# Диапазоны неорганических примесей по умолчанию, ммоль на 100 г:
+# калий, натрий, альфа-аминный азот
+IMPURITY_RANGES = {"K": (4.8, 7.05), "Na": (0.21, 0.82), "N": (1.58, 2.8)}
+
+# Режимы выборки для уменьшения дисперсии оценок по экспериментам
+SAMPLING_MODES = ("random", "sobol", "halton", "antithetic", "stratified")
+
+# Наибольшая размерность точек Соболя и Холтона; дальние координаты -
+# псевдослучайные (у Соболя предел 21201, память Холтона растет с размерностью)
+QMC_MAX_DIMENSION = 256
+
+
+def CMatrices(a: np.array, b: np.array) -> np.array:
+    # c_i1 = a_i, c_ij = c_i(j-1) * b_i(j-1); a формы (..., n), b формы (..., n, v - 1)
+    c = np.empty(b.shape[:-1] + (b.shape[-1] + 1,))
+    c[..., 0] = a
+    c[..., 1:] = a[..., None] * np.cumprod(b, axis=-1)
+    return c
+
 
 class MatrixGenerator:
-    def __init__(self, n: int = 10, v: int = 7, a_min: float = 0.12, a_max: float = 0.22, beta1: float = 0.85, beta2: float = 1.0):
+    def __init__(self, n: int = 10, v: int = 7, a_min: float = 0.12, a_max: float = 0.22, beta1: float = 0.85, beta2: float = 1.0,
+                 seed=None):
         self.__validate_parameters(n, v, a_min, a_max, beta1, beta2)
         self.n = n
         self.v = v
@@ -11,6 +40,22 @@ class MatrixGenerator:
         self.a_max = a_max
         self.beta1 = beta1
         self.beta2 = beta2
+        # seed - целое, None (случайная энтропия) или np.random.SeedSequence
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_sequence = seed
+        else:
+            self.seed_sequence = np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self.seed_sequence)
+
+        # Эмпирические распределения для distribution_type='empirical'
+        self.sugar_distribution = None
+        self.degradation_distribution = None
+
+        # Дополнительные условия: дозаривание и неорганические примеси (выключены)
+        self.ripening_days = 0
+        self.ripening_min = 1.0
+        self.ripening_max = 1.0
+        self.impurity_ranges = None
         
     @private
     def __validate_parameters(self, n: int, v: int, a_min: float, a_max: float, beta1: float, beta2: float):
@@ -23,42 +68,204 @@ class MatrixGenerator:
         if beta1 >= beta2:
             raise ValueError("beta1 must be less than beta2")
         
+    def SetEmpirical(self, sugar, degradation, method: str = "alias", **kwargs):
+        """
+        Задает распределения режима 'empirical' по историческим данным:
+        замеры сахаристости и суточных коэффициентов деградации (массивы или
+        готовые EmpiricalDistribution). Индекс выборки строится один раз.
+        """
+        if not isinstance(sugar, EmpiricalDistribution):
+            sugar = EmpiricalDistribution(sugar, method, **kwargs)
+        if not isinstance(degradation, EmpiricalDistribution):
+            degradation = EmpiricalDistribution(degradation, method, **kwargs)
+        self.sugar_distribution = sugar
+        self.degradation_distribution = degradation
+
+    def SetRipening(self, days: int, factor_min: float = 1.0, factor_max: float = 1.05):
+        """
+        Дозаривание: первые days суточных переходов умножают сахаристость на
+        коэффициенты из [factor_min, factor_max] (больше 1), дальше - деградация.
+        """
+        if days < 0:
+            raise ValueError("days must be non-negative")
+        if not 1 <= factor_min < factor_max:
+            raise ValueError("ripening factors must satisfy 1 <= factor_min < factor_max")
+        self.ripening_days = days
+        self.ripening_min = factor_min
+        self.ripening_max = factor_max
+
+    def SetImpurities(self, ranges: Dict[str, Tuple[float, float]] = None):
+        """
+        Неорганические примеси партии (K, Na, альфа-аминный N, ммоль на 100 г)
+        снижают извлекаемый сахар на потери в мелассе
+        (0.12 (K + Na) + 0.24 N + 0.48) %. None в ranges - диапазоны по умолчанию.
+        """
+        self.impurity_ranges = dict(IMPURITY_RANGES, **(ranges or {}))
+
     @private
-    def GenerateABMatrices(self, distribution_type: str) -> Tuple[np.array, np.array]:
-        a_vector = np.array([np.random.uniform(self.a_min, self.a_max) for _ in range(self.n)])  # вектор начальной сахаристости
+    def ApplyRipening(self, b: np.array) -> np.array:
+        # Коэффициенты первых дней дозаривания; b формы (m, n, v - 1) изменяется
+        m, n, transitions = b.shape
+        days = min(self.ripening_days, transitions)
+        if days:
+            b[:, :, :days] = self.rng.uniform(self.ripening_min, self.ripening_max, size=(m, n, days))
+        return b
+
+    @private
+    def ApplyImpurities(self, c: np.array) -> np.array:
+        # Потери сахара в мелассе из-за примесей; c формы (m, n, v) изменяется
+        if self.impurity_ranges is not None:
+            m, n, _ = c.shape
+            content = {key: self.rng.uniform(lo, hi, size=(m, n)) for key, (lo, hi) in self.impurity_ranges.items()}
+            loss = (0.12 * (content["K"] + content["Na"]) + 0.24 * content["N"] + 0.48) / 100
+            np.maximum(c - loss[:, :, None], 0, out=c)
+        return c
+
+    @private
+    def CheckDistribution(self, distribution_type: str):
+        if distribution_type not in DISTRIBUTIONS:
+            raise ValueError("Distribution type must be 'uniform', 'concentrated' or 'empirical'")
+        if distribution_type == "empirical" and self.sugar_distribution is None:
+            raise ValueError("Empirical distributions are not set, call SetEmpirical first")
+
+    def ChunkSeed(self, index: int) -> np.random.SeedSequence:
+        # Дочерняя последовательность части index; зависит только от seed и index,
+        # поэтому любую часть можно пересчитать отдельно, в любом процессе
+        parent = self.seed_sequence
+        return np.random.SeedSequence(parent.entropy, spawn_key=parent.spawn_key + (index,),
+                                      pool_size=parent.pool_size)
+
+    def Spawn(self, index: int) -> "MatrixGenerator":
+        """
+        Генератор с теми же параметрами и независимым потоком части index.
+
+        Если каждая часть экспериментов берет числа из Spawn(номер части),
+        итог не зависит от числа потоков и порядка обработки частей.
+        """
+        child = copy.copy(self)
+        child.seed_sequence = self.ChunkSeed(index)
+        child.rng = np.random.default_rng(child.seed_sequence)
+        return child
+
+    @private
+    def GenerateABBatch(self, m: int, distribution_type: str) -> Tuple[np.array, np.array]:
+        # m наборов (a, B): a формы (m, n), B формы (m, n, v), все числа - одной выборкой
+        self.CheckDistribution(distribution_type)
+        if distribution_type == "empirical":
+            a = self.sugar_distribution.Sample(self.rng, (m, self.n))
+            b = self.degradation_distribution.Sample(self.rng, (m, self.n, self.v))
+            return a, b
+
+        a = self.rng.uniform(self.a_min, self.a_max, size=(m, self.n))  # начальная сахаристость
 
         if distribution_type == "uniform":
-            b_matrix = np.array([[np.random.uniform(self.beta1, self.beta2) for _ in range(self.v)] for _ in range(self.n) ]) # матрица коэффициентов деградации
-        elif distribution_type == "concentrated":
-            b_matrix = np.array([[0.0 for _ in range(self.v)] for _ in range(self.n)]) # матрица коэффициентов деградации
-            
-            for i in range(self.n):
-                max_delta = (self.beta2 - self.beta1) / 4   
-                delta_i = np.random.uniform(0, max_delta)
-                
-                beta1_i = np.random.uniform(self.beta1, self.beta2 - delta_i)
-                beta2_i = beta1_i + delta_i
-                
-                for j in range(self.v):
-                    b_matrix[i][j] = np.random.uniform(beta1_i, beta2_i)
+            b = self.rng.uniform(self.beta1, self.beta2, size=(m, self.n, self.v))  # коэффициенты деградации
         else:
-            raise ValueError("Distribution type must be 'uniform' or 'concentrated'")
-        
-        return a_vector, b_matrix
+            # У каждой строки свой узкий диапазон [beta1_i, beta1_i + delta_i]
+            max_delta = (self.beta2 - self.beta1) / 4
+            delta = self.rng.uniform(0, max_delta, size=(m, self.n))
+            beta1_i = self.rng.uniform(self.beta1, self.beta2 - delta)
+            b = self.rng.uniform(beta1_i[:, :, None], (beta1_i + delta)[:, :, None], size=(m, self.n, self.v))
+
+        return a, b
+
+    @private
+    def GenerateABMatrices(self, distribution_type: str) -> Tuple[np.array, np.array]:
+        a, b = self.GenerateABBatch(1, distribution_type)
+        return a[0], b[0]
                 
     def GenerateCMatrix(self, distribution_type: str = "uniform") -> np.array:
-        a_vector, b_matrix = self.GenerateABMatrices(distribution_type)
-        
-        n, v = b_matrix.shape
-        c_matrix = np.zeros((n, v))
-        
-        c_matrix[:, 0] = a_vector # c_i1 = a_i
-        
-        for j in range(1, v):
-            c_matrix[:, j] = c_matrix[:, j-1] * b_matrix[:, j-1]
-        
-        return c_matrix
+        a, b = self.GenerateABBatch(1, distribution_type)
+        return self.ApplyImpurities(CMatrices(a, self.ApplyRipening(b[:, :, :-1])))[0]
     
+    @private
+    def UniformSample(self, m: int, d: int, sampling: str) -> np.array:
+        # m точек в единичном кубе размерности d
+        if sampling in ("sobol", "halton") and d > QMC_MAX_DIMENSION:
+            head = self.UniformSample(m, QMC_MAX_DIMENSION, sampling)
+            return np.hstack([head, self.rng.uniform(size=(m, d - QMC_MAX_DIMENSION))])
+        seed = self.rng.integers(2**32)
+        if sampling == "sobol":
+            # Баланс свойств Соболя нарушается при m, не равном степени двойки; выборка остается корректной
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", UserWarning)
+                return qmc.Sobol(d, scramble=True, seed=seed).random(m)
+        if sampling == "halton":
+            return qmc.Halton(d, scramble=True, seed=seed).random(m)
+        if sampling == "stratified":
+            return qmc.LatinHypercube(d, seed=seed).random(m)
+        if sampling == "antithetic":
+            half = self.rng.uniform(size=((m + 1) // 2, d))
+            return np.vstack([half, 1 - half])[:m]
+        raise ValueError(f"Sampling must be one of {SAMPLING_MODES}")
+
+    def GenerateCMatrixBatch(self, m: int, distribution_type: str = "uniform", sampling: str = "random") -> np.array:
+        """
+        Стопка из m матриц C формы (m, n, v).
+
+        sampling задает способ выборки сахаристости a и коэффициентов деградации B:
+        'random' - независимые псевдослучайные числа (как в GenerateCMatrix),
+        'sobol' и 'halton' - перемешанные квазислучайные последовательности,
+        'antithetic' - пары экспериментов u и 1 - u,
+        'stratified' - латинский гиперкуб.
+        В квазислучайных режимах точкой служит строка партии (a, параметры
+        строки и ее коэффициенты B), а не вся матрица.
+        Дозаривание и примеси (SetRipening, SetImpurities) применяются ко всей
+        стопке сразу.
+        """
+        a, b = self.SampleAB(m, distribution_type, sampling)
+        return self.ApplyImpurities(CMatrices(a, b))
+
+    def GenerateFactoredBatch(self, m: int, distribution_type: str = "uniform", sampling: str = "random",
+                              dtype=np.float64) -> FactoredMatrix:
+        """
+        Те же m экспериментов, что и GenerateCMatrixBatch, но без построения C:
+        стопка FactoredMatrix из a (m, n) и B (m, n, v - 1).
+        Потери от примесей вычитаются из C и не раскладываются в множители.
+        """
+        if self.impurity_ranges is not None:
+            raise ValueError("impurity losses cannot be represented by a factored matrix")
+        a, b = self.SampleAB(m, distribution_type, sampling)
+        return FactoredMatrix(a, b, dtype)
+
+    @private
+    def SampleAB(self, m: int, distribution_type: str, sampling: str):
+        # a формы (m, n) и b формы (m, n, v - 1) с учетом дозаривания
+        if sampling == "random":
+            a, b = self.GenerateABBatch(m, distribution_type)
+            return a, self.ApplyRipening(b[:, :, :-1])
+        self.CheckDistribution(distribution_type)
+
+        n, v = self.n, self.v
+        # Координаты строки: a, для сконцентрированного распределения - ширина и начало
+        # диапазона строки, затем коэффициенты B (v - 1)
+        extra = 2 if distribution_type == "concentrated" else 0
+        d = 1 + extra + (v - 1)
+        if sampling == "antithetic":
+            # Пары экспериментов u и 1 - u: точка - эксперимент целиком
+            u = self.UniformSample(m, n * d, sampling)
+        else:
+            # Точка - строка эксперимента, поэтому размерность не зависит от n
+            u = self.UniformSample(m * n, d, sampling)
+        u = u.reshape(m, n, d)
+
+        u_b = u[:, :, 1 + extra:]
+        if distribution_type == "empirical":
+            # Обратная функция распределения сохраняет равномерность точек
+            a = self.sugar_distribution.Quantile(u[:, :, 0])
+            return a, self.ApplyRipening(self.degradation_distribution.Quantile(u_b))
+
+        a = self.a_min + (self.a_max - self.a_min) * u[:, :, 0]
+        if distribution_type == "uniform":
+            b = self.beta1 + (self.beta2 - self.beta1) * u_b
+        else:
+            max_delta = (self.beta2 - self.beta1) / 4
+            delta = max_delta * u[:, :, 1]
+            beta1_i = self.beta1 + (self.beta2 - delta - self.beta1) * u[:, :, 2]
+            b = beta1_i[:, :, None] + delta[:, :, None] * u_b
+
+        return a, self.ApplyRipening(b)
+
     def GenerateDummyMatrix(self):
-        dummy_matrix = np.array(np.random.uniform(-200, 200, size=(self.n, self.n)))
+        dummy_matrix = self.rng.uniform(-200, 200, size=(self.n, self.n))
         return dummy_matrix
\ No newline at end of file
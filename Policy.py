@@ -0,0 +1,166 @@
+import numpy as np
+
+# Коды правил выбора строки на день
+RULE_MAX = 0        # максимум среди свободных строк
+RULE_KMIN = 1       # k-й минимум среди свободных строк (параметр - k)
+RULE_THRESHOLD = 2  # наименьшее значение не ниже порога (параметр - порог), иначе максимум
+
+
+class Policy:
+    """
+    Декларативное описание стратегии: последовательность правил выбора по дням.
+
+    Правило дня задается строкой 'max' или 'min' либо кортежем ('kmin', k)
+    или ('threshold', t). Существующие стратегии Computing доступны как
+    предустановки с теми же именами.
+    """
+    def __init__(self, rules):
+        self.codes = np.zeros(len(rules), dtype=int)
+        self.params = np.zeros(len(rules))
+
+        for day, rule in enumerate(rules):
+            if isinstance(rule, str):
+                rule = (rule,)
+            name = rule[0]
+
+            if name == 'max':
+                self.codes[day] = RULE_MAX
+            elif name == 'min':
+                self.codes[day], self.params[day] = RULE_KMIN, 1
+            elif name == 'kmin':
+                if int(rule[1]) < 1:
+                    raise ValueError("k must be at least 1")
+                self.codes[day], self.params[day] = RULE_KMIN, int(rule[1])
+            elif name == 'threshold':
+                self.codes[day], self.params[day] = RULE_THRESHOLD, float(rule[1])
+            else:
+                raise ValueError(f"Unknown rule '{name}'")
+
+    def __len__(self):
+        return len(self.codes)
+
+    @classmethod
+    def ThriftyMethod(cls, v):
+        return cls(['min'] * v)
+
+    @classmethod
+    def GreedyMethod(cls, v):
+        return cls(['max'] * v)
+
+    @classmethod
+    def Greedy_ThriftyMethodX(cls, v, x):
+        return cls(['max' if i < x else 'min' for i in range(v)])
+
+    @classmethod
+    def Thrifty_GreedyMethodX(cls, v, x):
+        return cls(['min' if i < x else 'max' for i in range(v)])
+
+    @classmethod
+    def TkG_MethodX(cls, v, k, x):
+        return cls([('kmin', k) if (i < x) and (i + k < v) else 'max' for i in range(v)])
+
+
+def SelectRow(code, param, column, candidates):
+    """
+    Выбор строки одного дня по правилу (code, param) среди строк candidates
+    с теми же правилами и разрешением равенств, что и в EvaluatePolicies.
+    Возвращает номер строки или None, если допустимых строк нет.
+    """
+    count = np.count_nonzero(candidates)
+    if count == 0:
+        return None
+
+    if code == RULE_THRESHOLD:
+        eligible = candidates & (column >= param)
+        if eligible.any():
+            return int(np.argmin(np.where(eligible, column, np.inf)))
+        code = RULE_MAX
+
+    if code == RULE_MAX:
+        return int(np.argmax(np.where(candidates, column, -np.inf)))
+
+    masked = np.where(candidates, column, np.inf)
+    k = max(min(int(param), count), 1)
+    if k == 1:
+        return int(np.argmin(masked))
+    return int(np.argsort(masked, kind='stable')[k - 1])
+
+
+def EvaluatePolicies(policies, matrices, log=False):
+    """
+    Вычисляет набор стратегий на матрице (n, v) или стопке матриц (m, n, v)
+    одним векторизованным проходом по дням.
+
+    Возвращает стоимости формы (P,) или (P, m) и значения по дням формы
+    (P, v) или (P, m, v), где P - число стратегий; дни без назначения равны 0.
+    Недопустимые элементы матрицы задаются значением NaN.
+    log=True - матрицы содержат логарифмы значений (FactoredMatrix.Log):
+    выбор строк не меняется, пороги сравниваются с log(param), а выбранные
+    значения возвращаются в исходной шкале.
+    """
+    matrices = np.asarray(matrices)
+    if not np.issubdtype(matrices.dtype, np.floating):
+        matrices = matrices.astype(float)
+    single = matrices.ndim == 2
+    if single:
+        matrices = matrices[None]
+    if matrices.ndim != 3:
+        raise ValueError("matrices must be an (n x v) or (experiments x n x v) array")
+
+    m, n, v = matrices.shape
+    for policy in policies:
+        if len(policy) != v:
+            raise ValueError("Policy length must match the number of days")
+
+    codes = np.array([policy.codes for policy in policies]).reshape(len(policies), v)
+    params = np.array([policy.params for policy in policies]).reshape(len(policies), v)
+    thresholds = params
+    if log:
+        positive = params > 0
+        thresholds = np.where(positive, np.log(np.where(positive, params, 1)), -np.inf)
+
+    available = np.ones((len(policies), m, n), dtype=bool)
+    values = np.zeros((len(policies), m, v))
+
+    for i in range(v):
+        col = np.broadcast_to(matrices[None, :, :, i], available.shape)
+        # Недопустимые пары партия/этап заданы значением NaN
+        candidates = available & ~np.isnan(matrices[None, :, :, i])
+        count = candidates.sum(axis=2)
+        assigned = count > 0
+        if not assigned.any():
+            continue
+
+        code = codes[:, i, None]
+        param = params[:, i, None]
+        rows = np.zeros((len(policies), m), dtype=np.intp)
+
+        if np.any(codes[:, i] == RULE_MAX) or np.any(codes[:, i] == RULE_THRESHOLD):
+            best = np.argmax(np.where(candidates, col, -np.inf), axis=2)
+            rows = np.where(code == RULE_MAX, best, rows)
+
+        if np.any(codes[:, i] == RULE_KMIN):
+            masked = np.where(candidates, col, np.inf)
+            k = np.maximum(np.minimum(param, count), 1).astype(np.intp)
+            if np.all(params[codes[:, i] == RULE_KMIN, i] == 1):
+                kth = np.argmin(masked, axis=2)
+            else:
+                ranked = np.argsort(masked, axis=2, kind='stable')
+                kth = np.take_along_axis(ranked, k[:, :, None] - 1, axis=2)[:, :, 0]
+            rows = np.where(code == RULE_KMIN, kth, rows)
+
+        if np.any(codes[:, i] == RULE_THRESHOLD):
+            eligible = candidates & (col >= thresholds[:, i, None, None])
+            above = np.argmin(np.where(eligible, col, np.inf), axis=2)
+            rows = np.where(code == RULE_THRESHOLD, np.where(eligible.any(axis=2), above, best), rows)
+
+        # День без допустимых свободных строк пропускается
+        chosen = np.take_along_axis(col, rows[:, :, None], axis=2)[:, :, 0]
+        values[:, :, i] = np.where(assigned, np.exp(chosen) if log else chosen, 0)
+        p, e = np.nonzero(assigned)
+        available[p, e, rows[p, e]] = False
+
+    costs = values.sum(axis=2)
+    if single:
+        return costs[:, 0], values[:, 0]
+    return costs, values
@@ -0,0 +1,96 @@
+import json
+import numpy as np
+
+import MatrixGenerator
+
+# Матриц в одной части при заполнении банка
+BANK_CHUNK_SIZE = 4096
+
+
+def MetadataPath(path):
+    # Параметры генератора хранятся рядом с матрицами: scenarios.npy -> scenarios.json
+    return path[:-4] + ".json" if path.endswith(".npy") else path + ".json"
+
+
+class ScenarioBank:
+    """
+    Заранее сгенерированные матрицы C (count, n, v) в .npy, открытом как memmap.
+
+    Рядом лежит небольшой .json с параметрами генератора, условиями
+    (дозаривание, примеси), распределением, способом выборки и seed, так что
+    банк воспроизводим. Чтение идет частями:
+    в памяти одновременно находится только текущая часть, а разные запуски
+    сравнения получают одни и те же сценарии (общие случайные числа).
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(MetadataPath(path), encoding="utf-8") as file:
+            self.metadata = json.load(file)
+        self.matrices = np.load(path, mmap_mode="r")
+        self.count, self.n, self.v = self.matrices.shape
+
+    def __len__(self):
+        return self.count
+
+    @classmethod
+    def Create(cls, path, generator, count, distribution_type="uniform", sampling="random",
+               chunk_size=BANK_CHUNK_SIZE):
+        """
+        Заполняет банк из count матриц генератора; часть i берется из потока
+        generator.Spawn(i), поэтому банк зависит только от параметров и seed.
+        """
+        matrices = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64,
+                                             shape=(count, generator.n, generator.v))
+        for index, start in enumerate(range(0, count, chunk_size)):
+            stop = min(start + chunk_size, count)
+            matrices[start:stop] = generator.Spawn(index).GenerateCMatrixBatch(
+                stop - start, distribution_type=distribution_type, sampling=sampling)
+        matrices.flush()
+        del matrices
+
+        metadata = {
+            "count": count,
+            "n": generator.n,
+            "v": generator.v,
+            "a_min": generator.a_min,
+            "a_max": generator.a_max,
+            "beta1": generator.beta1,
+            "beta2": generator.beta2,
+            "distribution": distribution_type,
+            "sampling": sampling,
+            "ripening_days": generator.ripening_days,
+            "ripening_min": generator.ripening_min,
+            "ripening_max": generator.ripening_max,
+            "impurity_ranges": generator.impurity_ranges,
+            "seed": generator.seed_sequence.entropy,
+            "spawn_key": list(generator.seed_sequence.spawn_key),
+            "chunk_size": chunk_size,
+        }
+        with open(MetadataPath(path), "w", encoding="utf-8") as file:
+            json.dump(metadata, file, indent=2)
+        return cls(path)
+
+    def Generator(self):
+        # Генератор с параметрами, условиями и seed банка, например для пересчета одной части
+        meta = self.metadata
+        if meta["distribution"] == "empirical":
+            raise ValueError("Empirical distributions are not stored in the bank; "
+                             "the generator of an empirical bank cannot be restored")
+        seed = np.random.SeedSequence(meta["seed"], spawn_key=tuple(meta["spawn_key"]))
+        generator = MatrixGenerator.MatrixGenerator(meta["n"], meta["v"], meta["a_min"], meta["a_max"],
+                                                    meta["beta1"], meta["beta2"], seed=seed)
+        if meta.get("ripening_days"):
+            generator.SetRipening(meta["ripening_days"], meta["ripening_min"], meta["ripening_max"])
+        if meta.get("impurity_ranges") is not None:
+            generator.SetImpurities({key: tuple(bounds) for key, bounds in meta["impurity_ranges"].items()})
+        return generator
+
+    def Chunk(self, start, stop):
+        # Копия матриц [start, stop) в памяти
+        return np.array(self.matrices[start:stop])
+
+    def Chunks(self, chunk_size, count=None):
+        # Последовательные части первых count матриц банка
+        count = self.count if count is None else min(count, self.count)
+        for start in range(0, count, chunk_size):
+            yield self.Chunk(start, min(start + chunk_size, count))
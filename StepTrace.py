@@ -0,0 +1,251 @@
+import bisect
+import numpy as np
+
+# Шаг, через который принудительно сохраняется полная матрица
+KEYFRAME_INTERVAL = 32
+
+# Маски шага в порядке хранения
+MASKS = ('stars', 'primes', 'row_covered', 'col_covered')
+
+
+class _Step:
+    # Запись одного шага: либо ключевой кадр (полная матрица), либо дельта
+    # (индексы измененных ячеек со старыми и новыми значениями).
+    # Маски упакованы по битам; неизменившиеся маски разделяются с прошлым шагом
+    __slots__ = ('matrix', 'cells', 'old', 'new', 'stars', 'primes',
+                 'row_covered', 'col_covered', 'description', 'stage')
+
+    def __init__(self, matrix, cells, old, new, masks, description, stage):
+        self.matrix = matrix
+        self.cells = cells
+        self.old = old
+        self.new = new
+        self.stars, self.primes, self.row_covered, self.col_covered = masks
+        self.description = description
+        self.stage = stage
+
+
+class StepTrace:
+    """
+    Компактное хранилище шагов трассировки: ключевые кадры раз в
+    keyframe_interval шагов и дельты между ними.
+
+    Дельта хранит только измененные ячейки матрицы (со старыми значениями,
+    поэтому откат на шаг назад тоже стоит O(изменений)), маски звезд, штрихов
+    и покрытий хранятся упакованными по битам. Если изменилась большая часть
+    матрицы (шаг 8), шаг сохраняется как ключевой кадр.
+    Индексация trace[i] восстанавливает словарь шага в прежнем формате;
+    последовательный обход в любую сторону стоит O(1) амортизированно,
+    произвольный переход - не больше keyframe_interval дельт.
+    """
+    def __init__(self, shape, keyframe_interval=KEYFRAME_INTERVAL, scale=1):
+        self.shape = tuple(shape)
+        self.keyframe_interval = keyframe_interval
+        # Целочисленная матрица с фиксированной точкой хранится точно
+        # и делится на scale только при выдаче шага
+        self.scale = scale
+        self.records = []
+        self.keyframes = [] # Индексы ключевых кадров по возрастанию
+
+        self._last_matrix = None
+        # Курсор: последний восстановленный шаг и его матрица
+        self._cursor = -1
+        self._cursor_matrix = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def __pack(self, mask, previous):
+        packed = np.packbits(mask, axis=None)
+        if previous is not None and np.array_equal(packed, previous):
+            return previous
+        return packed
+
+    def append(self, matrix, stars, primes, row_covered, col_covered, description, stage):
+        index = len(self.records)
+        previous = self.records[-1] if self.records else None
+        masks = tuple(
+            self.__pack(mask, getattr(previous, name) if previous else None)
+            for mask, name in zip((stars, primes, row_covered, col_covered), MASKS)
+        )
+
+        flat = np.ravel(matrix)
+        cells = None
+        if previous is not None and index % self.keyframe_interval:
+            cells = np.flatnonzero(flat != self._last_matrix)
+            if 3 * len(cells) > flat.size:
+                cells = None
+
+        if cells is None:
+            record = _Step(flat.copy(), None, None, None, masks, description, stage)
+            self.keyframes.append(index)
+        else:
+            record = _Step(None, cells, self._last_matrix[cells], flat[cells], masks, description, stage)
+        self.records.append(record)
+        self._last_matrix = flat.copy()
+
+    def __keyframe(self, index):
+        return self.keyframes[bisect.bisect_right(self.keyframes, index) - 1]
+
+    def __matrix(self, index):
+        # Перемещает курсор к шагу index ближайшим путем
+        cursor = self._cursor
+        key = self.__keyframe(index)
+        if cursor < 0 or abs(index - cursor) > index - key or (cursor > index and self.__keyframe(cursor) > index):
+            cursor = key
+            self._cursor_matrix = self.records[key].matrix.copy()
+
+        matrix = self._cursor_matrix
+        while cursor < index:
+            cursor += 1
+            record = self.records[cursor]
+            if record.matrix is not None:
+                matrix[:] = record.matrix
+            else:
+                matrix[record.cells] = record.new
+        while cursor > index:
+            record = self.records[cursor]
+            matrix[record.cells] = record.old
+            cursor -= 1
+
+        self._cursor = index
+        return matrix
+
+    def __unpack(self, packed, shape):
+        return np.unpackbits(packed, count=int(np.prod(shape))).reshape(shape).astype(bool)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.records)
+        if not 0 <= index < len(self.records):
+            raise IndexError("step index out of range")
+
+        rows, cols = self.shape
+        record = self.records[index]
+        matrix = self.__matrix(index).reshape(self.shape)
+        return {
+            'matrix': matrix / self.scale if self.scale != 1 else matrix.copy(),
+            'stars': self.__unpack(record.stars, self.shape),
+            'primes': self.__unpack(record.primes, self.shape),
+            'row_covered': self.__unpack(record.row_covered, (rows,)),
+            'col_covered': self.__unpack(record.col_covered, (cols,)),
+            'description': record.description,
+            'stage': record.stage
+        }
+
+
+class TraceReplay:
+    """
+    Пошаговый просмотр трассировки: get_current_state / next / prev.
+    Загруженная из файла трассировка уже полная; HungarianAlgorithm
+    дополняет ее лениво через produce_step.
+    """
+    def __init__(self, steps, original_matrix, mode):
+        self.steps = steps
+        self.original_matrix = original_matrix
+        self.mode = mode
+        self.current_step_index = 0
+        # Генератор оставшихся шагов; None - трассировка завершена
+        self.runner = None
+
+    def produce_step(self):
+        return False
+
+    def get_current_state(self):
+        if 0 <= self.current_step_index < len(self.steps):
+            return self.steps[self.current_step_index]
+        return None
+
+    def next(self):
+        if self.current_step_index == len(self.steps) - 1:
+            self.produce_step()
+        if self.current_step_index < len(self.steps) - 1:
+            self.current_step_index += 1
+            return self.get_current_state()
+        return None
+
+    def prev(self):
+        if self.current_step_index > 0:
+            self.current_step_index -= 1
+            return self.get_current_state()
+        return None
+    
+    def is_finished(self):
+        return self.runner is None and self.current_step_index == len(self.steps) - 1
+
+
+def SaveTrace(path, trace, original_matrix, mode):
+    """
+    Записывает трассировку в сжатый .npz: ключевые кадры, склеенные дельты
+    (индексы ячеек, старые и новые значения) и таблицы различных упакованных
+    масок со ссылками на них из каждого шага.
+    """
+    records = trace.records
+    arrays = {
+        'shape': np.array(trace.shape),
+        'keyframe_interval': np.array(trace.keyframe_interval),
+        'scale': np.array(trace.scale),
+        'original_matrix': np.asarray(original_matrix),
+        'mode': np.array(mode),
+        'keyframes': np.array(trace.keyframes, dtype=np.int64),
+        'descriptions': np.array([record.description for record in records]),
+        'stages': np.array([record.stage for record in records]),
+    }
+
+    size = int(np.prod(trace.shape))
+    keys = [record.matrix for record in records if record.matrix is not None]
+    arrays['keyframe_matrices'] = np.array(keys).reshape(len(keys), size)
+    deltas = [record for record in records if record.matrix is None]
+    lengths = [len(record.cells) for record in deltas]
+    arrays['delta_offsets'] = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+    arrays['delta_cells'] = np.concatenate([record.cells for record in deltas] + [np.empty(0, np.int64)]).astype(np.int32)
+    dtype = keys[0].dtype
+    arrays['delta_old'] = np.concatenate([record.old for record in deltas] + [np.empty(0, dtype)])
+    arrays['delta_new'] = np.concatenate([record.new for record in deltas] + [np.empty(0, dtype)])
+
+    # Общие маски соседних шагов - один и тот же объект, в файл пишется один раз
+    for name in MASKS:
+        table, index, refs = [], {}, []
+        for record in records:
+            mask = getattr(record, name)
+            if id(mask) not in index:
+                index[id(mask)] = len(table)
+                table.append(mask)
+            refs.append(index[id(mask)])
+        arrays[name] = np.array(table, dtype=np.uint8)
+        arrays[name + '_index'] = np.array(refs, dtype=np.int32)
+
+    np.savez_compressed(path, **arrays)
+
+
+def LoadTrace(path):
+    """Читает файл SaveTrace и возвращает TraceReplay без повторного вычисления."""
+    with np.load(path, allow_pickle=False) as data:
+        trace = StepTrace(tuple(data['shape']), int(data['keyframe_interval']), int(data['scale']))
+        keyframes = data['keyframes']
+        keyframe_matrices = data['keyframe_matrices']
+        offsets = data['delta_offsets']
+        cells = data['delta_cells'].astype(np.intp)
+        old = data['delta_old']
+        new = data['delta_new']
+        tables = {name: data[name] for name in MASKS}
+        refs = {name: data[name + '_index'] for name in MASKS}
+        # Маски различаются по ссылке, чтобы сохранить их разделение в памяти
+        shared = {name: list(tables[name]) for name in MASKS}
+
+        is_key = np.zeros(len(data['stages']), dtype=bool)
+        is_key[keyframes] = True
+        key, delta = 0, 0
+        for index, (description, stage) in enumerate(zip(data['descriptions'], data['stages'])):
+            masks = tuple(shared[name][refs[name][index]] for name in MASKS)
+            if is_key[index]:
+                record = _Step(keyframe_matrices[key].copy(), None, None, None, masks, str(description), str(stage))
+                key += 1
+            else:
+                lo, hi = offsets[delta], offsets[delta + 1]
+                record = _Step(None, cells[lo:hi], old[lo:hi], new[lo:hi], masks, str(description), str(stage))
+                delta += 1
+            trace.records.append(record)
+        trace.keyframes = [int(index) for index in keyframes]
+
+        return TraceReplay(trace, data['original_matrix'], str(data['mode']))
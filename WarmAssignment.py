@@ -0,0 +1,179 @@
+import numpy as np
+
+
+class WarmAssignment:
+    """
+    Оптимальное назначение минимальной стоимости вместе с двойственными
+    потенциалами, поддерживаемое при изменениях матрицы.
+
+    Прямоугольная задача (n строк, v столбцов) хранится как квадратная
+    размера max(n, v): фиктивные строки или столбцы имеют нулевую стоимость
+    и идут после настоящих. Потенциалы u, v удовлетворяют
+    cost[i, j] - u[i] - v[j] >= 0 с равенством на назначенных парах, поэтому
+    после изменения одной строки или столбца оптимум восстанавливается одним
+    кратчайшим увеличивающим путем за O(n^2) вместо полного решения за O(n^3).
+    """
+    def __init__(self, costs, row_ind, col_ind):
+        costs = np.asarray(costs, dtype=float)
+        self.rows, self.cols = costs.shape
+        size = max(self.rows, self.cols)
+        self.costs = np.zeros((size, size))
+        self.costs[:self.rows, :self.cols] = costs
+
+        self.col4row = np.full(size, -1)
+        self.row4col = np.full(size, -1)
+        self.col4row[row_ind] = col_ind
+        self.row4col[col_ind] = row_ind
+        # Фиктивные строки и столбцы нулевой стоимости дополняют назначение произвольно
+        free_rows = np.flatnonzero(self.col4row == -1)
+        free_cols = np.flatnonzero(self.row4col == -1)
+        self.col4row[free_rows] = free_cols
+        self.row4col[free_cols] = free_rows
+
+        # Потенциалы восстанавливаются лениво, при первом изменении
+        self.u = None
+        self.v = None
+
+    def Assignment(self):
+        rows = np.arange(self.rows)
+        cols = self.col4row[:self.rows]
+        real = cols < self.cols
+        return rows[real], cols[real]
+
+    def __Duals(self):
+        # Потенциалы по оптимальному назначению sigma: v[j] <= v[sigma(i)] + c[i, j] - c[i, sigma(i)],
+        # то есть кратчайшие расстояния (Беллман - Форд); отрицательных циклов нет, так как
+        # назначение оптимально
+        if self.u is not None:
+            return
+        size = self.costs.shape[0]
+        assigned = self.costs[np.arange(size), self.col4row]
+        weights = self.costs - assigned[:, None]
+        v = np.zeros(size)
+        for _ in range(size):
+            relaxed = np.minimum(v, (v[self.col4row][:, None] + weights).min(axis=0))
+            if np.array_equal(relaxed, v):
+                break
+            v = relaxed
+        self.v = v
+        self.u = assigned - v[self.col4row]
+
+    def __Augment(self, start):
+        # Кратчайший увеличивающий путь из свободной строки start по приведенным стоимостям
+        size = self.costs.shape[0]
+        shortest = np.full(size, np.inf)
+        path = np.full(size, -1)
+        scanned_cols = np.zeros(size, dtype=bool)
+        scanned_rows = [start]
+        row, min_val = start, 0.0
+
+        while True:
+            reduced = min_val + self.costs[row] - self.u[row] - self.v
+            better = ~scanned_cols & (reduced < shortest)
+            shortest[better] = reduced[better]
+            path[better] = row
+
+            remaining = np.where(scanned_cols, np.inf, shortest)
+            sink = np.argmin(remaining)
+            min_val = remaining[sink]
+            scanned_cols[sink] = True
+            if self.row4col[sink] == -1:
+                break
+            row = self.row4col[sink]
+            scanned_rows.append(row)
+
+        self.u[start] += min_val
+        for row in scanned_rows[1:]:
+            self.u[row] += min_val - shortest[self.col4row[row]]
+        self.v[scanned_cols] -= min_val - shortest[scanned_cols]
+
+        col = sink
+        while True:
+            row = path[col]
+            self.row4col[col] = row
+            col, self.col4row[row] = self.col4row[row], col
+            if row == start:
+                break
+
+    def __RepairRow(self, row):
+        # Строка снова допустима при u = min(c - v); если ее пара перестала быть
+        # жесткой, строка освобождается и переназначается
+        self.u[row] = np.min(self.costs[row] - self.v)
+        col = self.col4row[row]
+        if self.costs[row, col] - self.v[col] - self.u[row] > 0:
+            self.col4row[row] = -1
+            self.row4col[col] = -1
+            self.__Augment(row)
+
+    def Transpose(self):
+        self.costs = self.costs.T
+        self.rows, self.cols = self.cols, self.rows
+        self.col4row, self.row4col = self.row4col, self.col4row
+        self.u, self.v = self.v, self.u
+
+    def SetValue(self, row, col, value):
+        self.__Duals()
+        self.costs[row, col] = value
+        self.__RepairRow(row)
+
+    def AddRow(self, values):
+        self.__Duals()
+        size = self.costs.shape[0]
+        if self.rows == size:
+            # Нет фиктивной строки: добавляются новая строка и фиктивный столбец
+            self.costs = np.pad(self.costs, ((0, 1), (0, 1)))
+            self.v = np.append(self.v, np.min(-self.u))
+            self.u = np.append(self.u, 0.0)
+            self.col4row = np.append(self.col4row, -1)
+            self.row4col = np.append(self.row4col, -1)
+            self.costs[size, :self.cols] = values
+            self.rows += 1
+            self.u[size] = np.min(self.costs[size] - self.v)
+            self.__Augment(size)
+            return
+
+        # Первая фиктивная строка становится настоящей
+        self.costs[self.rows, :self.cols] = values
+        self.rows += 1
+        self.__RepairRow(self.rows - 1)
+
+    def DropRow(self, row):
+        self.__Duals()
+        col = self.col4row[row]
+        self.costs = np.delete(self.costs, row, axis=0)
+        self.u = np.delete(self.u, row)
+        self.col4row = np.delete(self.col4row, row)
+        self.row4col[self.row4col > row] -= 1
+        self.row4col[col] = -1
+        self.rows -= 1
+
+        size = self.costs.shape[1]
+        if self.rows >= self.cols:
+            # Лишний фиктивный столбец удаляется; если освободился настоящий столбец,
+            # строка удаленного фиктивного столбца переназначается в него
+            dummy = col if col >= self.cols else size - 1
+            owner = self.row4col[dummy]
+            self.costs = np.delete(self.costs, dummy, axis=1)
+            self.v = np.delete(self.v, dummy)
+            self.row4col = np.delete(self.row4col, dummy)
+            self.col4row[self.col4row > dummy] -= 1
+            if owner != -1:
+                self.col4row[owner] = -1
+                self.__Augment(owner)
+            return
+
+        # Настоящих строк меньше, чем столбцов: в конец добавляется фиктивная строка
+        self.costs = np.vstack([self.costs, np.zeros(size)])
+        self.u = np.append(self.u, np.min(-self.v))
+        self.col4row = np.append(self.col4row, -1)
+        self.__Augment(size - 1)
+
+    def AddColumn(self, values):
+        self.Transpose()
+        self.AddRow(values)
+        self.Transpose()
+
+    def DropColumn(self, col):
+        self.Transpose()
+        self.DropRow(col)
+        self.Transpose()
@@ -6,9 +6,13 @@ from ui.widgets.control_panel import ControlPanel
 from ui.widgets.visualization_tabs import VisualizationTabs
 from ui.widgets.comparison_panel import ComparisonPanel
 from ui.widgets.manual_panel import ManualPanel
+import numpy as np
 import Computing
 from HungarianAlgorithm import HungarianAlgorithm
 
+# Знаков после запятой для точной (целочисленной) трассировки
+EXACT_DECIMALS = 2
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -83,11 +87,19 @@ class MainWindow(QMainWindow):
         self.algorithm = None
         self.result_displayed = False
 
+        # Last solved matrix: small edits are repaired instead of re-solved
+        self.solution_matrix = None
+        self.solution_comp = None
+
     def start_algorithm(self):
         matrix = self.matrix_editor.get_matrix()
         mode = 'min' if self.matrix_editor.radio_min.isChecked() else 'max'
         
-        self.algorithm = HungarianAlgorithm(matrix, mode)
+        # Значения с не более чем двумя знаками считаются точно в целых числах;
+        # при большей точности шаги идут в плавающей точке, как и итоговое решение
+        scaled = np.asarray(matrix, dtype=float) * 10 ** EXACT_DECIMALS
+        exact = np.all(np.abs(scaled - np.rint(scaled)) < 1e-6) and np.all(np.abs(scaled) < 2**53)
+        self.algorithm = HungarianAlgorithm(matrix, mode, decimals=EXACT_DECIMALS if exact else None)
         self.result_displayed = False
         self.control_panel.log("<b>Алгоритм запущен.</b>", "#89B4FA")
         self.update_ui_from_state()
@@ -155,7 +167,7 @@ class MainWindow(QMainWindow):
         """
         try:
             matrix = self.matrix_editor.get_matrix()
-            comp = Computing.Computing(matrix)
+            comp = self.update_solution_computing(matrix)
             
             if self.matrix_editor.radio_min.isChecked():
                 cost, _ = comp.HungarianMinimum()
@@ -169,3 +181,27 @@ class MainWindow(QMainWindow):
             
         except Exception as e:
             self.control_panel.log(f"Ошибка при вычислении: {e}", "#F38BA8")
+
+    def update_solution_computing(self, matrix):
+        old = self.solution_matrix
+        comp = self.solution_comp
+        n = min(len(matrix), 0 if old is None else len(old))
+
+        # A freshly loaded matrix is cheaper to solve from scratch
+        if old is None or np.count_nonzero(old[:n, :n] != matrix[:n, :n]) > len(matrix):
+            comp = Computing.Computing(matrix)
+        else:
+            # Trailing rows/columns added or removed by resizing
+            for j in range(len(old) - 1, n - 1, -1):
+                comp.DropColumn(j)
+                comp.DropRow(j)
+            for j in range(n, len(matrix)):
+                comp.AddColumn(matrix[:j, j])
+                comp.AddRow(matrix[j, :j + 1])
+            # Edited cells
+            for i, j in zip(*np.nonzero(old[:n, :n] != matrix[:n, :n])):
+                comp.SetValue(i, j, matrix[i, j])
+
+        self.solution_matrix = matrix.copy()
+        self.solution_comp = comp
+        return comp
@@ -11,9 +11,57 @@ from matplotlib.figure import Figure
 import numpy as np
 import random
 import csv
-import scipy.optimize
+import os
 import Computing
 import MatrixGenerator
+import Policy
+import ScenarioBank
+
+# Number of experiments processed in one batched pass
+CHUNK_SIZE = 256
+
+# Memory budget of one chunk in bytes; an experiment holds about CHUNK_ARRAYS
+# float64 (n x v) arrays at once (B, its cumulative product, C, assignment costs)
+CHUNK_MEMORY = 512 * 2**20
+CHUNK_ARRAYS = 4
+
+# Number of threads for the exact assignment solves of a chunk
+WORKERS = os.cpu_count() or 1
+
+# Adaptive mode: experiments per chunk, minimum count before stopping and
+# the normal quantile of the 95% confidence interval
+ADAPTIVE_CHUNK_SIZE = 32
+ADAPTIVE_MIN_EXPERIMENTS = 30
+CONFIDENCE_Z = 1.96
+
+def chunk_limit(limit, size, days):
+    # Experiments per chunk: at most limit and within CHUNK_MEMORY for large matrices
+    return max(1, min(limit, CHUNK_MEMORY // (CHUNK_ARRAYS * size * days * 8)))
+
+class RunningStats:
+    """Running mean and variance (Welford), merged chunk by chunk."""
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, values):
+        count = len(values)
+        if count == 0:
+            return
+        mean = np.mean(values)
+        m2 = np.sum((values - mean) ** 2)
+        delta = mean - self.mean
+        total = self.count + count
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+
+    def half_width(self):
+        # Half-width of the confidence interval of the mean
+        if self.count < 2:
+            return np.inf
+        return CONFIDENCE_Z * np.sqrt(self.m2 / (self.count - 1) / self.count)
 
 class PlotNavigator:
     def __init__(self, canvas, ax):
@@ -92,12 +140,21 @@ class PlotNavigator:
 class Worker(QThread):
     progress = pyqtSignal(int)
     finished = pyqtSignal(dict)
+    failed = pyqtSignal(str)
 
     def __init__(self, params):
         super().__init__()
         self.params = params
 
     def run(self):
+        # An exception must not end the thread silently: the panel waits for
+        # finished or failed to re-enable the run button
+        try:
+            self.finished.emit(self.compute())
+        except Exception as e:
+            self.failed.emit(str(e))
+
+    def compute(self):
         size = self.params['size']
         days = self.params['days']
         experiments = self.params['experiments']
@@ -111,6 +168,19 @@ class Worker(QThread):
         deg_min = self.params['deg_min']
         deg_max = self.params['deg_max']
         distribution = self.params['distribution']
+        sampling = self.params.get('sampling', 'random')
+        adaptive = self.params.get('adaptive', False)
+        tolerance = self.params.get('tolerance', 0.01)
+        seed = self.params.get('seed')
+        ripening_days = self.params.get('ripening_days', 0)
+        impurities = self.params.get('impurities', False)
+
+        # Pre-generated scenarios replace the generator; sizes come from the bank
+        bank = None
+        if self.params.get('bank'):
+            bank = ScenarioBank.ScenarioBank(self.params['bank'])
+            size, days = bank.n, bank.v
+            experiments = min(experiments, len(bank))
         
         # Initialize accumulators for cumulative sums
         # Note: The size of arrays should now be 'days' (v), not 'size' (n)
@@ -141,91 +211,97 @@ class Worker(QThread):
             a_min=sugar_min, 
             a_max=sugar_max, 
             beta1=deg_min, 
-            beta2=deg_max
+            beta2=deg_max,
+            seed=seed
         )
+        if ripening_days:
+            generator.SetRipening(ripening_days)
+        if impurities:
+            generator.SetImpurities()
+
+        # Confidence intervals: final values (relative tolerance) and losses (absolute tolerance)
+        value_stats = {key: RunningStats() for key in results}
+        loss_stats = {key: RunningStats() for key in losses}
+
+        def converged():
+            if done < ADAPTIVE_MIN_EXPERIMENTS:
+                return False
+            values_ok = all(stats.half_width() <= tolerance * abs(stats.mean) for stats in value_stats.values())
+            losses_ok = all(stats.half_width() <= tolerance for stats in loss_stats.values())
+            return values_ok and losses_ok
+
+        # Heuristic strategies as Policy presets, keyed as in results
+        policy_keys = ['Thrifty', 'Greedy', 'GreedyThrifty', 'ThriftyGreedy', 'ThriftyKeyGreedy']
+        policies = [
+            Policy.Policy.ThriftyMethod(days),
+            Policy.Policy.GreedyMethod(days),
+            Policy.Policy.Greedy_ThriftyMethodX(days, transition),
+            Policy.Policy.Thrifty_GreedyMethodX(days, transition),
+            Policy.Policy.TkG_MethodX(days, k, transition)
+        ]
 
-        for i in range(experiments):
-            # Use GenerateCMatrix
-            matrix = generator.GenerateCMatrix(distribution_type=distribution)
-            
-            comp = Computing.Computing(matrix)
-
-            # Helper to add cumulative sum safely
+        chunk_size = chunk_limit(ADAPTIVE_CHUNK_SIZE if adaptive else CHUNK_SIZE, size, days)
+        done = 0
+        chunk_index = 0
+        while done < experiments:
+            # Experiments are processed in chunks: the heuristics run over the
+            # whole chunk at once in BatchComputing
+            chunk = min(chunk_size, experiments - done)
+            # Each chunk draws from its own child stream: the run is reproducible
+            # for a fixed seed and any chunk can be regenerated on its own
+            if bank is not None:
+                matrices = bank.Chunk(done, done + chunk)
+            else:
+                matrices = generator.Spawn(chunk_index).GenerateCMatrixBatch(chunk, distribution_type=distribution, sampling=sampling)
+            chunk_index += 1
+
+            batch = Computing.BatchComputing(matrices)
+
+            # Helper to add cumulative sums of a chunk; values have shape (chunk, days)
             def add_cum_sum(key, values):
-                # Pad values with zeros if length is less than days
-                padded_values = np.zeros(days)
-                length = min(len(values), days)
-                padded_values[:length] = values[:length]
-                
-                # If we stopped early, the cumulative sum should persist the last value?
-                # No, values are costs per step. If we stop, cost is 0.
-                # So cumsum will just stay flat.
-                
-                results[key] += np.cumsum(padded_values)
-                return np.sum(values)
-
-            # Hungarian Min
-            # We need to sort values by column index to represent time correctly
-            row_ind, col_ind = scipy.optimize.linear_sum_assignment(matrix)
-            # Create an array of size 'days' (v)
-            hungarian_min_values = np.zeros(days)
-            # Fill in the costs at the correct days (columns)
-            hungarian_min_values[col_ind] = matrix[row_ind, col_ind]
-            
-            # We use this sorted array for plotting
-            add_cum_sum('HungarianMin', hungarian_min_values)
+                results[key] += np.cumsum(values, axis=1).sum(axis=0)
+                value_stats[key].add(values.sum(axis=1))
+                return values.sum(axis=1)
 
-            # Hungarian Max (Optimal for Maximization)
-            row_ind, col_ind = scipy.optimize.linear_sum_assignment(-matrix)
-            hungarian_max_values = np.zeros(days)
-            hungarian_max_values[col_ind] = matrix[row_ind, col_ind]
-            
+            # Hungarian Min / Max, values are placed at their days (columns)
+            (_, hungarian_min_values), (_, hungarian_max_values) = batch.HungarianMinMax(workers=WORKERS)
+
+            add_cum_sum('HungarianMin', hungarian_min_values)
             opt_val = add_cum_sum('HungarianMax', hungarian_max_values)
 
-            # Thrifty
-            _, values = comp.ThriftyMethod()
-            val = add_cum_sum('Thrifty', values)
-            if opt_val != 0:
-                losses['Thrifty'] += (opt_val - val) / opt_val
-
-            # Greedy
-            _, values = comp.GreedyMethod()
-            val = add_cum_sum('Greedy', values)
-            if opt_val != 0:
-                losses['Greedy'] += (opt_val - val) / opt_val
-
-            # Greedy -> Thrifty
-            _, values = comp.Greedy_ThriftyMethodX(transition)
-            val = add_cum_sum('GreedyThrifty', values)
-            if opt_val != 0:
-                losses['GreedyThrifty'] += (opt_val - val) / opt_val
-
-            # Thrifty -> Greedy
-            _, values = comp.Thrifty_GreedyMethodX(transition)
-            val = add_cum_sum('ThriftyGreedy', values)
-            if opt_val != 0:
-                losses['ThriftyGreedy'] += (opt_val - val) / opt_val
-
-            # Thrifty(k) -> Greedy
-            _, values = comp.TkG_MethodX(k, transition)
-            val = add_cum_sum('ThriftyKeyGreedy', values)
-            if opt_val != 0:
-                losses['ThriftyKeyGreedy'] += (opt_val - val) / opt_val
-
-            self.progress.emit(int((i + 1) / experiments * 100))
+            # Relative loss against the optimum, experiments with zero optimum are skipped
+            nonzero = opt_val != 0
+            def add_loss(key, val):
+                loss = np.zeros(chunk)
+                loss[nonzero] = (opt_val[nonzero] - val[nonzero]) / opt_val[nonzero]
+                losses[key] += loss.sum()
+                loss_stats[key].add(loss)
+
+            # All heuristics are evaluated in one pass over the chunk
+            _, values = batch.EvaluatePolicies(policies)
+            for key, policy_values in zip(policy_keys, values):
+                add_loss(key, add_cum_sum(key, policy_values))
+
+            done += chunk
+            if adaptive and converged():
+                break
+            self.progress.emit(int(done / experiments * 100))
+
+        self.progress.emit(100)
 
         # Average out results
         for key in results:
-            results[key] /= experiments
+            results[key] /= done
             
         # Average out losses
         for key in losses:
-            losses[key] /= experiments
+            losses[key] /= done
             
         # Add losses to results dictionary
         results['losses'] = losses
+        results['experiments_used'] = done
 
-        self.finished.emit(results)
+        return results
 
 class ComparisonPanel(QWidget):
     def __init__(self, parent=None):
@@ -242,14 +318,28 @@ class ComparisonPanel(QWidget):
         self.params_group = QGroupBox("Основные параметры")
         self.params_layout = QFormLayout(self.params_group)
         
-        self.spin_size_days = QSpinBox()
-        self.spin_size_days.setRange(2, 100)
-        self.spin_size_days.setValue(15)
+        self.spin_size = QSpinBox()
+        self.spin_size.setRange(2, 1000)
+        self.spin_size.setValue(15)
+
+        self.spin_days = QSpinBox()
+        self.spin_days.setRange(2, 1000)
+        self.spin_days.setValue(15)
 
         self.spin_experiments = QSpinBox()
         self.spin_experiments.setRange(1, 10000)
         self.spin_experiments.setValue(100)
         
+        # Adaptive experiment count: the spinbox above becomes the upper limit
+        self.check_adaptive = QCheckBox("Остановка по доверительному интервалу")
+        self.spin_tolerance = QDoubleSpinBox()
+        self.spin_tolerance.setDecimals(3)
+        self.spin_tolerance.setRange(0.001, 1)
+        self.spin_tolerance.setSingleStep(0.001)
+        self.spin_tolerance.setValue(0.01)
+        self.spin_tolerance.setEnabled(False)
+        self.check_adaptive.toggled.connect(self.spin_tolerance.setEnabled)
+        
         self.spin_transition = QSpinBox()
         self.spin_transition.setRange(1, 100)
         self.spin_transition.setValue(7)
@@ -309,12 +399,35 @@ class ComparisonPanel(QWidget):
         self.dist_layout.addWidget(self.radio_uniform)
         self.dist_layout.addWidget(self.radio_concentrated)
 
-        self.params_layout.addRow("Кол-во партий и этапов:", self.spin_size_days)
+        self.params_layout.addRow("Кол-во партий:", self.spin_size)
+        self.params_layout.addRow("Кол-во этапов:", self.spin_days)
         self.params_layout.addRow("Эксперименты:", self.spin_experiments)
+        self.params_layout.addRow(self.check_adaptive)
+        self.params_layout.addRow("Точность:", self.spin_tolerance)
         self.params_layout.addRow("Этап смены стратегии:", self.spin_transition)
         self.params_layout.addRow("Параметр k:", self.spin_k)
         self.params_layout.addRow("Суточная масса:", self.spin_mass)
         
+        # Sampling mode for variance reduction
+        self.combo_sampling = QComboBox()
+        self.sampling_modes = ['random', 'sobol', 'halton', 'antithetic', 'stratified']
+        self.combo_sampling.addItems([
+            "Случайная", "Соболь", "Холтон", "Антитетическая", "Стратифицированная (LHS)"
+        ])
+        self.params_layout.addRow("Выборка:", self.combo_sampling)
+
+        # Seed of the random streams, 0 - new random run every time
+        self.spin_seed = QSpinBox()
+        self.spin_seed.setRange(0, 2**31 - 1)
+        self.spin_seed.setSpecialValueText("Случайное")
+        self.params_layout.addRow("Зерно:", self.spin_seed)
+
+        # Scenario bank (.npy of pre-generated matrices); cancelling the dialog clears it
+        self.bank_path = None
+        self.btn_bank = QPushButton("Не выбран")
+        self.btn_bank.clicked.connect(self.select_bank)
+        self.params_layout.addRow("Банк сценариев:", self.btn_bank)
+
         self.params_layout.addRow(QLabel("Распределение:"))
         self.params_layout.addRow(self.dist_layout)
         
@@ -324,6 +437,23 @@ class ComparisonPanel(QWidget):
         
         self.params_layout.addRow(QLabel("Деградация:"))
         self.params_layout.addRow(self.deg_layout)
+
+        # Extra conditions: early ripening days and inorganic impurity losses
+        self.conditions_layout = QHBoxLayout()
+        self.check_ripening = QCheckBox("Дозаривание, дней:")
+        self.spin_ripening = QSpinBox()
+        self.spin_ripening.setRange(1, 100)
+        self.spin_ripening.setValue(3)
+        self.spin_ripening.setEnabled(False)
+        self.check_ripening.toggled.connect(self.spin_ripening.setEnabled)
+        self.check_impurities = QCheckBox("Неорганика")
+
+        self.conditions_layout.addWidget(self.check_ripening)
+        self.conditions_layout.addWidget(self.spin_ripening)
+        self.conditions_layout.addWidget(self.check_impurities)
+
+        self.params_layout.addRow(QLabel("Дополнительные условия:"))
+        self.params_layout.addRow(self.conditions_layout)
         
         self.settings_layout.addWidget(self.params_group)
         
@@ -448,8 +578,8 @@ class ComparisonPanel(QWidget):
             return
 
         params = {
-            'size': self.spin_size_days.value(),
-            'days': self.spin_size_days.value(),
+            'size': self.spin_size.value(),
+            'days': self.spin_days.value(),
             'experiments': self.spin_experiments.value(),
             'transition': self.spin_transition.value(),
             'k': self.spin_k.value(),
@@ -458,7 +588,14 @@ class ComparisonPanel(QWidget):
             'sugar_max': self.spin_sugar_max.value(),
             'deg_min': self.spin_deg_min.value(),
             'deg_max': self.spin_deg_max.value(),
-            'distribution': 'uniform' if self.radio_uniform.isChecked() else 'concentrated'
+            'distribution': 'uniform' if self.radio_uniform.isChecked() else 'concentrated',
+            'sampling': self.sampling_modes[self.combo_sampling.currentIndex()],
+            'adaptive': self.check_adaptive.isChecked(),
+            'tolerance': self.spin_tolerance.value(),
+            'seed': self.spin_seed.value() or None,
+            'bank': self.bank_path,
+            'ripening_days': self.spin_ripening.value() if self.check_ripening.isChecked() else 0,
+            'impurities': self.check_impurities.isChecked()
         }
         
         self.btn_run.setEnabled(False)
@@ -466,6 +603,7 @@ class ComparisonPanel(QWidget):
         
         self.worker = Worker(params)
         self.worker.finished.connect(self.on_finished)
+        self.worker.failed.connect(self.on_failed)
         self.worker.start()
 
     def on_finished(self, results):
@@ -474,6 +612,11 @@ class ComparisonPanel(QWidget):
         self.current_results = results
         self.update_view()
 
+    def on_failed(self, message):
+        self.btn_run.setEnabled(True)
+        self.btn_run.setText("Запустить сравнение")
+        QMessageBox.critical(self, "Ошибка", f"Не удалось выполнить сравнение:\n{message}")
+
     def update_view(self):
         if self.current_results is None:
             return
@@ -575,6 +718,7 @@ class ComparisonPanel(QWidget):
         
         text = f"""
         <h2 style="color: #cba6f7">Общие результаты экспериментов</h2>
+        <p>Проведено экспериментов: <b>{results.get('experiments_used', self.spin_experiments.value())}</b>.</p>
         <p>Согласно проделанным экспериментам можно сделать следующие выводы:</p>
         <ul>
         """
@@ -591,9 +735,24 @@ class ComparisonPanel(QWidget):
         
         self.results_text.setHtml(text)
 
+    def select_bank(self):
+        fileName, _ = QFileDialog.getOpenFileName(self, "Банк сценариев", "", "NumPy Files (*.npy);;All Files (*)")
+        self.bank_path = fileName or None
+        self.btn_bank.setText(os.path.basename(fileName) if fileName else "Не выбран")
+        # The bank fixes sizes, distribution, sampling, seed and conditions:
+        # the generator controls are disabled while it is selected
+        enabled = self.bank_path is None
+        for widget in (self.spin_size, self.spin_days, self.combo_sampling, self.spin_seed,
+                       self.radio_uniform, self.radio_concentrated,
+                       self.spin_sugar_min, self.spin_sugar_max, self.spin_deg_min, self.spin_deg_max,
+                       self.check_ripening, self.check_impurities):
+            widget.setEnabled(enabled)
+        self.spin_ripening.setEnabled(enabled and self.check_ripening.isChecked())
+
     def randomize_parameters(self):
         val = random.randint(10, 30)
-        self.spin_size_days.setValue(val)
+        self.spin_size.setValue(val)
+        self.spin_days.setValue(val)
         self.spin_experiments.setValue(random.randint(50, 500))
         self.spin_transition.setValue(random.randint(1, val))
         self.spin_k.setValue(random.randint(1, 5))